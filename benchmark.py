@@ -0,0 +1,244 @@
+"""
+Throughput and scaling benchmarks for the steady-state solver.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --baseline bench.json --output new.json
+
+Times solver.calculate for every solve method on single-pressure, multi-pressure and
+composition sweeps, measures parallel speed-up and the cold import time of the modules
+worker processes load, and flags regressions against a baseline.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import platform
+import datetime
+import tracemalloc
+
+import numpy as np
+import scipy
+
+import solver
+from parallel import calculate_parallel
+
+SIZES = (10, 100, 1000, 10_000, 100_000, 1_000_000)
+METHODS = ("newton", "resultant", "continuation", "fsolve")
+PARAM_FILES = ("Sio2_para.py", "test_para.py")
+# The point-by-point method gets slow on big grids, so it stops early by default
+MAX_POINTS = {"fsolve": 10_000}
+
+PRESSURES = (11, 110, 550, 1100, 11000)
+C_O_VALUES = (0.1, 0.3, 0.5, 0.7, 0.9)
+
+def grid(case, points):
+    """(temperatures, pressures, C_O) of a sweep with about `points` grid points."""
+    if case == "single-pressure":
+        return np.linspace(300, 2000, points), [1100], 10 / 11
+    if case == "multi-pressure":
+        return np.linspace(300, 2000, max(1, points // len(PRESSURES))), list(PRESSURES), 10 / 11
+    if case == "composition":
+        return np.linspace(300, 5000, max(1, points // len(C_O_VALUES))), [1000], list(C_O_VALUES)
+    raise ValueError(f"Unknown case: {case}")
+
+CASES = ("single-pressure", "multi-pressure", "composition")
+
+# Modules every worker process imports, and the heavy ones they should not pull in
+IMPORT_MODULES = ("solver", "parallel", "postprocess")
+HEAVY_MODULES = ("pandas", "matplotlib", "scipy.optimize")
+
+class _CountEvaluations:
+    # Counts point evaluations of the balance equations by wrapping solver.balance
+    def __init__(self):
+        self.count = 0
+
+    def __enter__(self):
+        self._balance = solver.balance
+
+        def balance(theta_O, theta_N, coeffs):
+            self.count += np.size(theta_O)
+            return self._balance(theta_O, theta_N, coeffs)
+
+        solver.balance = balance
+        return self
+
+    def __exit__(self, *exc):
+        solver.balance = self._balance
+
+def run_case(case, param_file, method, points, repeat=3):
+    temperatures, pressures, C_O = grid(case, points)
+    sweep_axis = "C_O" if case == "composition" and method == "continuation" else "T"
+
+    def run():
+        solver.clear_rate_cache()
+        return solver.calculate(temperatures, pressures, param_file, C_O=C_O, method=method,
+                                sweep_axis=sweep_axis, output="arrays")
+
+    # Warm-up also loads the parameter file
+    res_dict = run()
+    n = len(res_dict["T"])
+
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - start)
+
+    with _CountEvaluations() as counter:
+        run()
+
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    best = min(seconds)
+    return {
+        "case": case,
+        "param_file": param_file,
+        "method": method,
+        "points": n,
+        "seconds": best,
+        "points_per_second": n / best,
+        "nfev_per_point": counter.count / n,
+        "peak_memory_mb": peak / 1e6,
+    }
+
+def run_parallel(param_file, points, workers, method="newton"):
+    temperatures, pressures, C_O = grid("multi-pressure", points)
+    timings = {}
+    for w in workers:
+        start = time.perf_counter()
+        calculate_parallel(temperatures, pressures, param_file, C_O=C_O, method=method, max_workers=w, output="arrays")
+        timings[w] = time.perf_counter() - start
+    base = timings[workers[0]] * workers[0]
+    return [{"param_file": param_file, "method": method, "points": len(temperatures) * len(pressures),
+             "workers": w, "seconds": t, "speedup": base / t, "efficiency": base / t / w}
+            for w, t in timings.items()]
+
+def import_time(module, repeat=5):
+    """Cold import time of a module in fresh interpreters, and which heavy modules it loads."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = (f"import sys, time; start = time.perf_counter(); import {module}; "
+            f"print(time.perf_counter() - start); print(*[m for m in {HEAVY_MODULES!r} if m in sys.modules])")
+    seconds = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True, text=True, check=True)
+        lines = out.stdout.splitlines()
+        seconds.append(float(lines[0]))
+    return {"module": module, "seconds": min(seconds), "heavy_modules": lines[1].split() if len(lines) > 1 else []}
+
+def compare_imports(imports, baseline, tolerance):
+    """Modules that import slower than the baseline or pull in heavy modules they did not before."""
+    previous = {entry["module"]: entry for entry in baseline.get("imports", [])}
+    regressions = []
+    for entry in imports:
+        old = previous.get(entry["module"])
+        if old is None:
+            continue
+        # Interpreter start-up jitter is tens of milliseconds
+        if entry["seconds"] > old["seconds"] * (1 + tolerance) + 0.05:
+            regressions.append((entry["module"], "import_seconds", old["seconds"], entry["seconds"]))
+        added = set(entry["heavy_modules"]) - set(old["heavy_modules"])
+        if added:
+            regressions.append((entry["module"], f"imports {', '.join(sorted(added))}", 0, len(added)))
+    return regressions
+
+def compare(results, baseline, tolerance):
+    """Entries that got slower or bigger than the baseline by more than tolerance."""
+    def key(entry):
+        return entry["case"], entry["param_file"], entry["method"], entry["points"]
+
+    previous = {key(entry): entry for entry in baseline.get("results", [])}
+    regressions = []
+    for entry in results:
+        old = previous.get(key(entry))
+        if old is None:
+            continue
+        if entry["points_per_second"] < old["points_per_second"] * (1 - tolerance):
+            regressions.append((key(entry), "points_per_second", old["points_per_second"], entry["points_per_second"]))
+        if entry["peak_memory_mb"] > old["peak_memory_mb"] * (1 + tolerance) + 1:
+            regressions.append((key(entry), "peak_memory_mb", old["peak_memory_mb"], entry["peak_memory_mb"]))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--methods", nargs="+", default=METHODS, choices=METHODS)
+    parser.add_argument("--cases", nargs="+", default=CASES, choices=CASES)
+    parser.add_argument("--param-files", nargs="+", default=PARAM_FILES)
+    parser.add_argument("--workers", type=int, nargs="+", default=None,
+                        help="Process counts for the parallel speed-up run (default: 1, 2, 4, ... up to all cores)")
+    parser.add_argument("--parallel-points", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--import-modules", nargs="*", default=IMPORT_MODULES,
+                        help="Modules to time the cold import of (none to skip)")
+    parser.add_argument("--no-limits", action="store_true", help="Run point-by-point methods on every size")
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="JSON of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown (default 0.2)")
+    args = parser.parse_args(argv)
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    param_files = [p if os.path.isabs(p) else os.path.join(here, p) for p in args.param_files]
+
+    results = []
+    for param_file in param_files:
+        for case in args.cases:
+            for method in args.methods:
+                for points in args.sizes:
+                    if not args.no_limits and points > MAX_POINTS.get(method, np.inf):
+                        continue
+                    entry = run_case(case, param_file, method, points, repeat=args.repeat)
+                    entry["param_file"] = os.path.basename(param_file)
+                    results.append(entry)
+                    print(f"{entry['param_file']:>14} {case:>16} {method:>13} {entry['points']:>9d} pts"
+                          f" {entry['points_per_second']:>12.0f} pts/s {entry['nfev_per_point']:>7.1f} fev/pt"
+                          f" {entry['peak_memory_mb']:>9.1f} MB", flush=True)
+
+    workers = args.workers
+    if workers is None:
+        cores = os.cpu_count() or 1
+        workers = sorted({1, cores} | {2**k for k in range(cores.bit_length()) if 2**k <= cores})
+    scaling = run_parallel(param_files[0], args.parallel_points, workers)
+    for entry in scaling:
+        print(f"parallel {entry['workers']:>3d} workers {entry['seconds']:>8.3f} s"
+              f" speed-up {entry['speedup']:>6.2f} efficiency {entry['efficiency']:>5.2f}")
+
+    imports = [import_time(module) for module in args.import_modules]
+    for entry in imports:
+        heavy = ", ".join(entry["heavy_modules"]) or "none"
+        print(f"import {entry['module']:>12} {entry['seconds']:>8.3f} s heavy modules: {heavy}")
+
+    report = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "scipy": scipy.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+        "parallel": scaling,
+        "imports": imports,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance) + compare_imports(imports, baseline, args.tolerance)
+        for key, metric, old, new in regressions:
+            print(f"REGRESSION {key}: {metric} {old:.4g} -> {new:.4g}")
+        if regressions:
+            return 1
+        print("No regressions")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+import os
+
+import numpy as np
+from scipy.optimize import least_squares
+
+from parameters import Parameters, load_parameters, save_parameters
+from solver import rate_coefficients, reaction_rates, recombination_coefficients, solve_coefficients, resolve_composition
+from sensitivity import parameter_sensitivities
+from parallel import worker_pool
+
+class Measurement:
+    """
+    Measured recombination coefficients of one species pair, e.g. gamma_OO against temperature.
+    :param sigma: Standard deviation of ln(gamma), scalar or per point; the fit is done on ln(gamma)
+                  because measured gamma spans decades.
+    """
+
+    def __init__(self, T, values, P, C_O=10/11, column="gamma_OO", sigma=1.0, name=None):
+        self.T, self.values, self.P, self.C_O, self.sigma = np.broadcast_arrays(
+            *(np.asarray(v, dtype=float) for v in (T, values, P, C_O, sigma)))
+        self.column = column
+        self.name = name or column
+
+    @classmethod
+    def from_csv(cls, filename, P, C_O=10/11, column="gamma_OO", x="x", y="y", sigma=1.0):
+        """Read points stored as x = 1000/T and y = gamma, like fitted_curve_points.csv."""
+        import pandas as pd
+        data = pd.read_csv(filename)
+        return cls(1000 / data[x].to_numpy(), data[y].to_numpy(), P, C_O=C_O, column=column, sigma=sigma,
+                   name=os.path.basename(filename))
+
+    def __len__(self):
+        return self.T.size
+
+class _Model:
+    # All measured points solved together; every solve starts from the coverages of the previous one
+    def __init__(self, base, measurements, names):
+        self.base = base
+        self.names = tuple(names)
+        self.measurements = measurements
+        self.T = np.concatenate([m.T for m in measurements])
+        self.P = np.concatenate([m.P for m in measurements])
+        self.C_O = np.concatenate([resolve_composition(base, m.C_O) for m in measurements])
+        self.values = np.concatenate([m.values for m in measurements])
+        self.sigma = np.concatenate([m.sigma for m in measurements])
+        columns = np.concatenate([[m.column] * len(m) for m in measurements])
+        self.rows = {column: columns == column for column in dict.fromkeys(columns)}
+        self.theta_O = None
+        self.theta_N = None
+        self._last = None
+        self.evaluations = 0
+
+    def parameters(self, x):
+        return self.base.derive(**{name: float(value) for name, value in zip(self.names, x)})
+
+    def solve(self, x):
+        """Results at the measured points for the parameter values x."""
+        if self._last is not None and np.array_equal(self._last[0], x):
+            return self._last[1]
+        params = self.parameters(x)
+        coeffs = rate_coefficients(params, self.T, self.P, self.C_O)
+        theta_O, theta_N, _ = solve_coefficients(coeffs, self.theta_O, self.theta_N)
+        self.theta_O, self.theta_N = theta_O.copy(), theta_N.copy()
+
+        results = {"T": self.T, "P": self.P, "C_O": self.C_O, "theta_O": theta_O, "theta_N": theta_N}
+        results.update(recombination_coefficients(reaction_rates(theta_O, theta_N, coeffs), coeffs))
+        self.evaluations += 1
+        self._last = (np.array(x), (params, results))
+        return params, results
+
+    def model(self, results, prefix=""):
+        # Measured column of every point, e.g. results['gamma_OO'] or with prefix 'd' sensitivities['dgamma_OO/ds_O']
+        out = np.empty(self.T.size)
+        for column, rows in self.rows.items():
+            out[rows] = results[prefix + column][rows]
+        return out
+
+    def residuals(self, x):
+        _, results = self.solve(x)
+        gamma = self.model(results)
+        return (np.log(np.maximum(gamma, np.finfo(float).tiny)) - np.log(self.values)) / self.sigma
+
+    def jacobian(self, x):
+        params, results = self.solve(x)
+        gamma = self.model(results)
+        # The residuals re-derive Q_lh* from the fitted energies, so the derivatives have to as well
+        sens = parameter_sensitivities(params, results, names=self.names, derive=True)
+        jac = np.empty((gamma.size, len(self.names)))
+        for j, name in enumerate(self.names):
+            dgamma = self.model({f"d{column}": sens[f"d{column}/d{name}"] for column in self.rows}, prefix="d")
+            jac[:, j] = dgamma / np.maximum(gamma, np.finfo(float).tiny) / self.sigma
+        return jac
+
+class CalibrationResult:
+    """Best fit over all starts; starts holds (x0, x, cost, success) of every start."""
+
+    def __init__(self, params, names, x, cost, success, message, starts, evaluations):
+        self.params = params
+        self.names = names
+        self.x = x
+        self.cost = cost
+        self.success = success
+        self.message = message
+        self.starts = starts
+        self.evaluations = evaluations
+
+    @property
+    def values(self):
+        return {name: float(value) for name, value in zip(self.names, self.x)}
+
+    def __repr__(self):
+        values = ", ".join(f"{k}={v:.6g}" for k, v in self.values.items())
+        return f"CalibrationResult(cost={self.cost:.6g}, {values})"
+
+def _fit(base, measurements, names, x0, lower, upper, options):
+    # One local least-squares fit in variables scaled by the starting values
+    model = _Model(base, measurements, names)
+    scale = np.where(x0 != 0, np.abs(x0), 1.0)
+    fit = least_squares(lambda z: model.residuals(z * scale), x0 / scale,
+                        jac=lambda z: model.jacobian(z * scale) * scale,
+                        bounds=(lower / scale, upper / scale), **options)
+    return fit.x * scale, fit.cost, fit.success, fit.message, model.evaluations
+
+def _start_points(x0, lower, upper, n_starts, seed):
+    # The given values first, then random points, log-uniform where the bounds allow it
+    rng = np.random.default_rng(seed)
+    starts = [x0]
+    for _ in range(n_starts - 1):
+        u = rng.random(x0.size)
+        log = (lower > 0) & np.isfinite(upper)
+        x = np.where(log, np.exp(np.log(np.where(log, lower, 1)) + u * np.log(np.where(log, upper / lower, 1))),
+                     lower + u * (upper - lower))
+        starts.append(x)
+    return starts
+
+def calibrate(param_file, measurements, names, bounds=None, n_starts=1, max_workers=None, seed=None,
+              output_file=None, mp_context=None, **options):
+    """
+    Fit a subset of the kinetic parameters to measured recombination coefficients by least squares on ln(gamma).
+    The Jacobian comes from the analytic sensitivities, and the coverages of every evaluation start from the
+    previous ones, so each objective evaluation costs about one batched Newton solve of the measured points.
+    :param measurements: Measurement or list of them.
+    :param names: Parameters to fit, e.g. ['s_O', 'Q_erOO'].
+    :param bounds: {name: (lower, upper)}; parameters without bounds may vary by a factor 10 either way,
+                   so parameters that start at 0 need explicit bounds.
+    :param n_starts: Number of starting points; beyond the first they are drawn within the bounds
+                     and fitted on a process pool.
+    :param output_file: Write the best parameter set to this parameter file.
+    :param options: Passed to scipy.optimize.least_squares.
+    :return: CalibrationResult
+    """
+    base = param_file if isinstance(param_file, Parameters) else load_parameters(param_file)
+    if isinstance(measurements, Measurement):
+        measurements = [measurements]
+    names = tuple(names)
+    bounds = bounds or {}
+    x0 = np.array([getattr(base, name) for name in names], dtype=float)
+    unbounded = [name for name, v in zip(names, x0) if v == 0 and name not in bounds]
+    if unbounded:
+        raise ValueError(f"Parameters starting at 0 need explicit bounds: {', '.join(unbounded)}")
+    lower = np.array([bounds.get(name, (min(0.1 * v, 10 * v), None))[0] for name, v in zip(names, x0)], dtype=float)
+    upper = np.array([bounds.get(name, (None, max(0.1 * v, 10 * v)))[1] for name, v in zip(names, x0)], dtype=float)
+    x0 = np.clip(x0, lower, upper)
+    starts = _start_points(x0, lower, upper, n_starts, seed)
+
+    if n_starts == 1:
+        fits = [_fit(base, measurements, names, starts[0], lower, upper, options)]
+    else:
+        with worker_pool(max_workers or min(n_starts, os.cpu_count() or 1), mp_context) as executor:
+            futures = [executor.submit(_fit, base, measurements, names, x, lower, upper, options) for x in starts]
+            fits = [future.result() for future in futures]
+
+    best = min(range(len(fits)), key=lambda i: fits[i][1])
+    x, cost, success, message, _ = fits[best]
+    cost = float(cost)
+    params = base.derive(**{name: float(value) for name, value in zip(names, x)})
+    result = CalibrationResult(params, names, x, cost, success, message,
+                               [(x_start, fit[0], fit[1], fit[2]) for x_start, fit in zip(starts, fits)],
+                               sum(fit[4] for fit in fits))
+
+    if output_file is not None:
+        source = param_file if isinstance(param_file, str) else "a Parameters object"
+        fitted = ", ".join(f"{name}={value!r}" for name, value in result.values.items())
+        datasets = ", ".join(f"{m.name} ({len(m)} points)" for m in measurements)
+        save_parameters(params, output_file,
+                        header=f"Calibrated from {source}\nFitted: {fitted}\nAgainst: {datasets}\n"
+                               f"Cost: {cost!r}")
+    return result
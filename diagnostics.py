@@ -0,0 +1,116 @@
+import numpy as np
+
+# Exit status of every point
+NOT_SOLVED = -1   # Not solved in this run
+CONVERGED = 0     # Fast path converged
+FALLBACK = 1      # Converged only after falling back to fsolve
+ROBUST = 2        # Failed the validity check, solved by bisection on the reduced problem
+FAILED = 3        # No solver found a valid solution
+STATUS_NAMES = {NOT_SOLVED: "not solved", CONVERGED: "converged", FALLBACK: "fallback", ROBUST: "robust",
+                FAILED: "failed"}
+
+class ConvergenceDiagnostics:
+    """
+    Per-point solver telemetry, filled in by the solvers while they run.
+    residual is the scaled max-norm max(|eq1|, |eq2|) / (s_O n_O + s_N n_N).
+    history keeps the first max_history residuals of every point: one per Newton iterate, one per
+    function evaluation for points that went through fsolve and one at the end of the bisection tier;
+    unused entries are NaN.
+    """
+
+    def __init__(self, n, max_history=32, coords=None):
+        self.n = n
+        self.iterations = np.zeros(n, dtype=np.int64)
+        self.nfev = np.zeros(n, dtype=np.int64)
+        self.status = np.full(n, NOT_SOLVED, dtype=np.int8)
+        self.ier = np.zeros(n, dtype=np.int8)
+        self.residual = np.full(n, np.nan)
+        self.history = np.full((n, max_history), np.nan)
+        self.history_length = np.zeros(n, dtype=np.int64)
+        self.messages = {}
+        self.coords = None
+        self.shape = None
+        if coords is not None:
+            self.set_grid(coords)
+
+    def set_grid(self, coords):
+        """Attach the (temperatures, pressures, C_O) axes of the grid the points were solved on."""
+        self.coords = {dim: np.atleast_1d(np.asarray(v, dtype=float)) for dim, v in zip(("T", "P", "C_O"), coords)}
+        self.shape = tuple(v.size for v in self.coords.values())
+        if int(np.prod(self.shape)) != self.n:
+            raise ValueError(f"Grid of shape {self.shape} does not hold {self.n} points")
+
+    # Recording, called by the solvers with the rows of the points they work on
+
+    def log_residual(self, rows, residual):
+        """Append one residual to the history of every row and make it the current one."""
+        self.residual[rows] = residual
+        position = self.history_length[rows]
+        room = position < self.history.shape[1]
+        self.history[rows[room], position[room]] = residual[room]
+        self.history_length[rows] += 1
+
+    def log_iteration(self, rows, nfev):
+        self.iterations[rows] += 1
+        self.nfev[rows] += nfev
+
+    def log_fsolve(self, row, infodict, ier, msg):
+        self.nfev[row] += infodict["nfev"]
+        self.ier[row] = ier
+        if ier != 1:
+            self.messages[int(row)] = msg
+
+    # Summaries
+
+    @property
+    def converged(self):
+        return (self.status == CONVERGED) | (self.status == FALLBACK) | (self.status == ROBUST)
+
+    def summary(self):
+        """Point counts per exit status and the spread of the solver cost."""
+        counts = {STATUS_NAMES[s]: int(np.count_nonzero(self.status == s)) for s in STATUS_NAMES}
+        solved = self.status != NOT_SOLVED
+        nfev = self.nfev[solved]
+        return {
+            "points": self.n,
+            **counts,
+            "nfev_total": int(nfev.sum()),
+            "nfev_mean": float(nfev.mean()) if nfev.size else np.nan,
+            "nfev_max": int(nfev.max()) if nfev.size else 0,
+            "iterations_mean": float(self.iterations[solved].mean()) if nfev.size else np.nan,
+            "iterations_max": int(self.iterations[solved].max()) if nfev.size else 0,
+            "nfev_share_fallback": float(self.nfev[self.status == FALLBACK].sum() / nfev.sum()) if nfev.sum() else 0.0,
+            "residual_max": float(np.nanmax(self.residual)) if np.isfinite(self.residual).any() else np.nan,
+        }
+
+    def to_dataframe(self):
+        """One row per point with its coordinates (when on a grid) and telemetry."""
+        columns = {}
+        if self.coords is not None:
+            T, P, C = np.meshgrid(*self.coords.values(), indexing="ij")
+            columns.update(T=T.ravel(), P=P.ravel(), C_O=C.ravel())
+        columns.update(iterations=self.iterations, nfev=self.nfev, status=self.status, ier=self.ier, residual=self.residual)
+        import pandas as pd
+        return pd.DataFrame(columns)
+
+    def slowest(self, k=10):
+        """The k points that cost the most function evaluations."""
+        frame = self.to_dataframe()
+        return frame.iloc[np.argsort(-self.nfev, kind="stable")[:k]]
+
+    def _grid(self, values):
+        if self.shape is None:
+            raise ValueError("Diagnostics were not recorded on a grid")
+        return values.reshape(self.shape)
+
+    def failure_map(self):
+        """Fraction of the C_O points at every (T, P) that did not converge, shape (n_T, n_P)."""
+        return self._grid(self.status == FAILED).mean(axis=2)
+
+    def cost_map(self):
+        """Mean function evaluations per point at every (T, P), shape (n_T, n_P)."""
+        return self._grid(self.nfev).mean(axis=2)
+
+    def histories(self, rows):
+        """Residual histories of the given rows, trimmed to their recorded length."""
+        return [self.history[i, :min(self.history_length[i], self.history.shape[1])] for i in np.atleast_1d(rows)]
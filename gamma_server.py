@@ -0,0 +1,328 @@
+"""
+Local query server for recombination coefficients, for CFD codes that need gamma at many wall faces per iteration.
+
+    python gamma_server.py serve Sio2_para.py --socket /tmp/gamma.sock
+    python gamma_server.py serve Sio2_para.py --port 5757
+    python gamma_server.py bench Sio2_para.py --clients 4 --faces 5000 --iterations 50
+
+The server loads one parameter set and answers requests over a Unix socket or localhost TCP.
+Requests arriving together are coalesced into one batched solve. Every connection is warm-started from
+its previous answer when it sends the same number of faces again, which is the usual case between CFD iterations.
+
+Framing, all little-endian:
+    request:  b'GAMQ', uint32 n, then float64 T[n], p[n], C_O[n]
+    response: b'GAMR', uint32 n, uint32 n_columns, uint32 error, then float64 column[n] for each of
+              SERVER_COLUMNS; when error is non-zero, the body is instead n bytes of UTF-8 message.
+"""
+import os
+import sys
+import time
+import queue
+import socket
+import struct
+import argparse
+import threading
+import socketserver
+
+import numpy as np
+
+from parameters import Parameters, load_parameters
+from solver import rate_coefficients, solve_coefficients, reaction_rates, recombination_coefficients
+
+SERVER_COLUMNS = ("theta_O", "theta_N", "gamma_OO", "gamma_NN", "gamma_ON", "gamma_NO", "status")
+
+REQUEST = struct.Struct("<4sI")
+RESPONSE = struct.Struct("<4sIII")
+REQUEST_MAGIC = b"GAMQ"
+RESPONSE_MAGIC = b"GAMR"
+# Largest request accepted, in points (24 bytes each)
+MAX_POINTS = 10_000_000
+
+def _recv_exact(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError("Connection closed")
+        received += n
+    return buffer
+
+def _send_error(sock, message):
+    body = message.encode()
+    sock.sendall(RESPONSE.pack(RESPONSE_MAGIC, len(body), 0, 1) + body)
+
+class _Request:
+    # One client request waiting for the solver thread
+    def __init__(self, T, p, C_O, theta):
+        self.T, self.p, self.C_O = T, p, C_O
+        self.theta = theta
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class _Handler(socketserver.BaseRequestHandler):
+    def setup(self):
+        if self.request.family != socket.AF_UNIX:
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self):
+        server = self.server.gamma
+        theta = None
+        while True:
+            try:
+                magic, n = REQUEST.unpack(_recv_exact(self.request, REQUEST.size))
+            except ConnectionError:
+                return
+            if magic != REQUEST_MAGIC or n > MAX_POINTS:
+                _send_error(self.request, "Bad request header")
+                return
+            data = np.frombuffer(_recv_exact(self.request, 24 * n), dtype="<f8").reshape(3, n)
+            if not (np.all(np.isfinite(data)) and np.all(data[:2] > 0) and np.all((data[2] >= 0) & (data[2] <= 1))):
+                _send_error(self.request, "T and p must be finite and positive, C_O within [0, 1]")
+                continue
+            # Faces of a CFD wall come back in the same order every iteration
+            if theta is not None and theta[0].size != n:
+                theta = None
+            request = server.submit(data[0], data[1], data[2], theta)
+            request.done.wait()
+            if request.error is not None:
+                _send_error(self.request, request.error)
+                continue
+            block = request.result
+            theta = block[:2]
+            # One send per response; a separate header would meet Nagle's algorithm and delayed ACKs on TCP
+            self.request.sendall(RESPONSE.pack(RESPONSE_MAGIC, n, block.shape[0], 0)
+                                 + np.ascontiguousarray(block, dtype="<f8").tobytes())
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class GammaServer:
+    """
+    Serves SERVER_COLUMNS for batches of (T, p, C_O) points.
+    :param address: Path of a Unix socket, or (host, port) for TCP.
+    :param window: Seconds the solver waits for more requests after the first one of a batch; with 0 it
+                   takes whatever is queued, which batches concurrent requests without adding latency.
+    :param max_batch: Points per coalesced solve.
+    """
+
+    def __init__(self, param_file, address, window=0.0, max_batch=1_000_000):
+        self.params = param_file if isinstance(param_file, Parameters) else load_parameters(param_file)
+        self.address = address
+        self.window = window
+        self.max_batch = max_batch
+        self.stats = {"requests": 0, "batches": 0, "points": 0, "solve_seconds": 0.0}
+        self._queue = queue.Queue()
+        if isinstance(address, str):
+            if os.path.exists(address):
+                os.unlink(address)
+            self._server = _UnixServer(address, _Handler)
+        else:
+            self._server = _TCPServer(address, _Handler)
+            self.address = self._server.server_address
+        self._server.gamma = self
+        self._solver = threading.Thread(target=self._run, daemon=True)
+        self._solver.start()
+
+    def submit(self, T, p, C_O, theta=None):
+        request = _Request(T, p, C_O, theta)
+        self._queue.put(request)
+        return request
+
+    def _run(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                return
+            batch = [request]
+            points = request.T.size
+            deadline = time.monotonic() + self.window
+            while points < self.max_batch:
+                try:
+                    timeout = deadline - time.monotonic()
+                    request = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._queue.put(None)
+                    break
+                batch.append(request)
+                points += request.T.size
+            self._solve_batch(batch)
+
+    def _solve_batch(self, batch):
+        start = time.perf_counter()
+        try:
+            T, p, C_O = (np.concatenate([getattr(r, name) for r in batch]) for name in ("T", "p", "C_O"))
+            theta_O, theta_N = (np.concatenate([r.theta[i] if r.theta is not None else np.full(r.T.size, np.nan)
+                                                for r in batch]) for i in (0, 1))
+            block = self.solve(T, p, C_O, theta_O, theta_N)
+        except Exception as error:
+            for r in batch:
+                r.error = f"{type(error).__name__}: {error}"
+                r.done.set()
+            return
+        self.stats["solve_seconds"] += time.perf_counter() - start
+        self.stats["batches"] += 1
+        self.stats["requests"] += len(batch)
+        self.stats["points"] += T.size
+        offset = 0
+        for r in batch:
+            r.result = block[:, offset:offset + r.T.size]
+            offset += r.T.size
+            r.done.set()
+
+    def solve(self, T, p, C_O, theta_O=None, theta_N=None):
+        """
+        SERVER_COLUMNS at flat arrays of points, one (len(SERVER_COLUMNS), n) block.
+        :param theta_O, theta_N: Coverages to start Newton from, NaN (or None) for a cold start.
+        """
+        n = T.size
+        # Coalesced batches mix the wall temperatures of several clients and rarely repeat exactly, so no rate cache
+        coeffs = rate_coefficients(self.params, T, p, C_O, cache=False)
+        theta_O, theta_N, status = solve_coefficients(coeffs, theta_O, theta_N)
+
+        block = np.empty((len(SERVER_COLUMNS), n))
+        block[0], block[1] = theta_O, theta_N
+        gamma = recombination_coefficients(reaction_rates(theta_O, theta_N, coeffs), coeffs)
+        for row, name in zip(block[2:6], SERVER_COLUMNS[2:6]):
+            row[:] = gamma[name]
+        block[6] = status
+        return block
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start(self):
+        """Serve from a background thread; returns self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._queue.put(None)
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+class GammaClient:
+    """Connection to a GammaServer; query() is one request/response round trip."""
+
+    def __init__(self, address):
+        if isinstance(address, str):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.connect(address)
+
+    def query(self, T, p, C_O=10/11):
+        """
+        :param T, p, C_O: Arrays (or scalars) broadcastable against each other.
+        :return: Dictionary of SERVER_COLUMNS, each a flat array.
+        """
+        data = np.array(np.broadcast_arrays(*(np.asarray(v, dtype="<f8").ravel() for v in (T, p, C_O))))
+        n = data.shape[1]
+        self.sock.sendall(REQUEST.pack(REQUEST_MAGIC, n) + data.tobytes())
+        magic, size, n_columns, error = RESPONSE.unpack(_recv_exact(self.sock, RESPONSE.size))
+        if magic != RESPONSE_MAGIC:
+            raise ConnectionError("Bad response header")
+        if error:
+            raise RuntimeError(_recv_exact(self.sock, size).decode())
+        block = np.frombuffer(_recv_exact(self.sock, 8 * n_columns * size), dtype="<f8").reshape(n_columns, size)
+        return dict(zip(SERVER_COLUMNS, block))
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def benchmark(address, clients=4, faces=5000, iterations=50, T_range=(300, 2000), p_range=(10, 10_000), seed=0):
+    """
+    Latency and throughput of concurrent clients, each sending the same wall faces every iteration
+    with slightly drifting temperatures, as a coupled CFD run would.
+    :return: Dictionary of latency percentiles (s) and throughput (points/s).
+    """
+    latencies = [[] for _ in range(clients)]
+
+    def run(k):
+        rng = np.random.default_rng(seed + k)
+        T = rng.uniform(*T_range, faces)
+        p = np.exp(rng.uniform(*np.log(p_range), faces))
+        with GammaClient(address) as client:
+            for _ in range(iterations):
+                start = time.perf_counter()
+                client.query(T, p)
+                latencies[k].append(time.perf_counter() - start)
+                T = T * (1 + 1e-3 * rng.standard_normal(faces))
+
+    threads = [threading.Thread(target=run, args=(k,)) for k in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    latency = np.concatenate(latencies)
+    return {"clients": clients, "faces": faces, "iterations": iterations, "seconds": seconds,
+            "points_per_second": clients * faces * iterations / seconds,
+            "latency_p50": float(np.percentile(latency, 50)), "latency_p90": float(np.percentile(latency, 90)),
+            "latency_p99": float(np.percentile(latency, 99))}
+
+def _address(args):
+    return (args.host, args.port) if args.port is not None else args.socket
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("serve", "bench"))
+    parser.add_argument("param_file")
+    parser.add_argument("--socket", default="/tmp/gamma.sock", help="Unix socket path (default /tmp/gamma.sock)")
+    parser.add_argument("--port", type=int, help="Serve on localhost TCP instead of a Unix socket")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--window", type=float, default=0.0, help="Seconds to wait for more requests per batch")
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--faces", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--connect", action="store_true", help="bench: use a running server instead of starting one")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        server = GammaServer(args.param_file, _address(args), window=args.window)
+        print(f"Serving {args.param_file} on {server.address}", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+        return 0
+
+    server = None if args.connect else GammaServer(args.param_file, _address(args), window=args.window).start()
+    address = server.address if server is not None else _address(args)
+    try:
+        result = benchmark(address, clients=args.clients, faces=args.faces, iterations=args.iterations)
+    finally:
+        if server is not None:
+            server.close()
+    print(f"{result['clients']} clients x {result['faces']} faces x {result['iterations']} iterations:"
+          f" {result['points_per_second']:.0f} points/s, latency p50 {1e3 * result['latency_p50']:.2f} ms,"
+          f" p90 {1e3 * result['latency_p90']:.2f} ms, p99 {1e3 * result['latency_p99']:.2f} ms")
+    if server is not None:
+        stats = server.stats
+        print(f"{stats['batches']} batches for {stats['requests']} requests,"
+              f" {stats['points'] / max(stats['batches'], 1):.0f} points per batch,"
+              f" {stats['solve_seconds']:.2f} s solving")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+import numpy as np
+from scipy.interpolate import PchipInterpolator
+
+from parameters import load_parameters
+from solver import solve_points, sweep
+
+GAMMA_COLUMNS = ("gamma_OO", "gamma_NN", "gamma_ON", "gamma_NO")
+
+def _cell(axis, x):
+    # Cell index and fractional position on an ascending axis; single-value axes collapse to their node
+    if axis.size == 1:
+        return np.zeros(x.shape, dtype=np.intp), np.zeros(x.shape), 0
+    x = np.clip(x, axis[0], axis[-1])
+    step = np.diff(axis)
+    if np.allclose(step, step[0], rtol=1e-9, atol=0):
+        # Uniform axis: the cell follows from the position directly
+        u = (x - axis[0]) / step[0]
+        i = np.minimum(u.astype(np.intp), axis.size - 2)
+        return i, u - i, 1
+    i = np.clip(np.searchsorted(axis, x, side="right") - 1, 0, axis.size - 2)
+    return i, (x - axis[i]) / step[i], 1
+
+def _corners(t, d):
+    # (offset, weight) of both ends of a cell, or just the node of a single-value axis
+    return ((0, 1 - t), (1, t)) if d else ((0, 1.0),)
+
+class GammaTable:
+    """
+    Recombination coefficients tabulated on an ascending grid in 1/T, ln p and C_O.
+    ln(gamma) is interpolated, so the table stays accurate over decades of gamma:
+    multilinear with method='linear', or monotone cubic (PCHIP) in 1/T and linear in ln p and C_O
+    with method='cubic'.
+    """
+
+    def __init__(self, inv_T, log_p, C_O, log_gamma, method="linear", error=None):
+        if method not in ("linear", "cubic"):
+            raise ValueError(f"Unknown interpolation method: {method}")
+        self.inv_T = np.asarray(inv_T, dtype=float)
+        self.log_p = np.asarray(log_p, dtype=float)
+        self.C_O = np.atleast_1d(np.asarray(C_O, dtype=float))
+        # Shape (n_T, n_p, n_C, len(GAMMA_COLUMNS)), every axis ascending
+        self.log_gamma = np.asarray(log_gamma, dtype=float)
+        self.method = method
+        self.error = error or {}
+        for name, axis in (("1/T", self.inv_T), ("ln p", self.log_p), ("C_O", self.C_O)):
+            if np.any(np.diff(axis) <= 0):
+                raise ValueError(f"Table axis {name} must be strictly ascending")
+
+        if method == "cubic":
+            if self.inv_T.size < 3:
+                raise ValueError("Cubic interpolation needs at least 3 temperatures")
+            # Node slopes of the monotone cubic along 1/T, computed once
+            self._slope = PchipInterpolator(self.inv_T, self.log_gamma, axis=0).derivative()(self.inv_T)
+
+    @property
+    def T_range(self):
+        return 1 / self.inv_T[-1], 1 / self.inv_T[0]
+
+    @property
+    def p_range(self):
+        return np.exp(self.log_p[0]), np.exp(self.log_p[-1])
+
+    def query(self, T, p, C_O=None):
+        """
+        Interpolated gamma for arrays of wall states. Queries outside the table are clamped to its edges.
+        :return: Dictionary of gamma arrays shaped like the broadcast inputs.
+        """
+        if C_O is None:
+            if self.C_O.size > 1:
+                raise ValueError("Table covers several compositions, C_O is required")
+            C_O = self.C_O[0]
+        T, p, C_O = np.broadcast_arrays(np.asarray(T, dtype=float), np.asarray(p, dtype=float), np.asarray(C_O, dtype=float))
+        if self.C_O.size == 1 and not np.allclose(C_O, self.C_O[0]):
+            raise ValueError(f"Table only covers C_O = {self.C_O[0]}")
+
+        iT, tT, dT = _cell(self.inv_T, 1 / T.ravel())
+        iP, tP, dP = _cell(self.log_p, np.log(p.ravel()))
+        iC, tC, dC = _cell(self.C_O, C_O.ravel())
+
+        if self.method == "cubic":
+            # Cubic Hermite basis along 1/T
+            h = np.diff(self.inv_T)[iT] if dT else 0.0
+            t2, t3 = tT**2, tT**3
+            weights_T = [(0, 2 * t3 - 3 * t2 + 1, h * (t3 - 2 * t2 + tT)), (dT, -2 * t3 + 3 * t2, h * (t3 - t2))]
+        else:
+            weights_T = [(0, 1 - tT, None), (dT, tT, None)]
+
+        # Gather whole rows of the flattened table, one per cell corner
+        n_P, n_C = self.log_gamma.shape[1:3]
+        values = self.log_gamma.reshape(-1, len(GAMMA_COLUMNS))
+        slopes = self._slope.reshape(-1, len(GAMMA_COLUMNS)) if self.method == "cubic" else None
+        log_gamma = np.zeros((iT.size, len(GAMMA_COLUMNS)))
+        for a, w_value, w_slope in weights_T:
+            for b, w_P in _corners(tP, dP):
+                for c, w_C in _corners(tC, dC):
+                    row = ((iT + a) * n_P + iP + b) * n_C + iC + c
+                    w = w_P * w_C
+                    log_gamma += (w * w_value)[:, None] * values.take(row, axis=0)
+                    if w_slope is not None:
+                        log_gamma += (w * w_slope)[:, None] * slopes.take(row, axis=0)
+        gamma = np.exp(log_gamma)
+        return {name: gamma[:, k].reshape(T.shape) for k, name in enumerate(GAMMA_COLUMNS)}
+
+    def save(self, path):
+        error = np.array([[self.error.get(name, {}).get(stat, np.nan) for stat in ("max", "rms")] for name in GAMMA_COLUMNS])
+        np.savez(path, inv_T=self.inv_T, log_p=self.log_p, C_O=self.C_O, log_gamma=self.log_gamma,
+                 method=self.method, error=error)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            error = {name: {"max": data["error"][k, 0], "rms": data["error"][k, 1]} for k, name in enumerate(GAMMA_COLUMNS)}
+            return cls(data["inv_T"], data["log_p"], data["C_O"], data["log_gamma"], method=str(data["method"]), error=error)
+
+def build_gamma_table(param_file, T_range=(300, 3000), p_range=(1, 1e5), C_O=10/11, n_T=200, n_p=60,
+                      method="linear", n_check=1000, seed=0):
+    """
+    Solve gamma once on a table grid and estimate the interpolation error against spot-check solves.
+    :param C_O: A single mole fraction or an ascending array of them, evenly spaced or not.
+    :param method: 'linear' or 'cubic', see GammaTable.
+    :param n_check: Number of random off-grid states solved exactly for the error estimate.
+    """
+    inv_T = np.linspace(1 / T_range[1], 1 / T_range[0], n_T)
+    log_p = np.linspace(np.log(p_range[0]), np.log(p_range[1]), n_p)
+    C_O = np.atleast_1d(np.asarray(C_O, dtype=float))
+    if np.any(np.diff(C_O) <= 0):
+        raise ValueError("C_O must be strictly ascending")
+
+    result = sweep(1 / inv_T, np.exp(log_p), param_file, C_O=C_O)
+    log_gamma = np.stack([np.log(result[name]) for name in GAMMA_COLUMNS], axis=-1)
+    table = GammaTable(inv_T, log_p, C_O, log_gamma, method=method)
+
+    if n_check:
+        rng = np.random.default_rng(seed)
+        T = 1 / rng.uniform(inv_T[0], inv_T[-1], n_check)
+        p = np.exp(rng.uniform(log_p[0], log_p[-1], n_check))
+        C = rng.uniform(C_O[0], C_O[-1], n_check) if C_O.size > 1 else np.full(n_check, C_O[0])
+
+        exact = solve_points(load_parameters(param_file), T, p, C)
+        approx = table.query(T, p, C)
+        for name in GAMMA_COLUMNS:
+            rel = np.abs(approx[name] / exact[name] - 1)
+            table.error[name] = {"max": float(np.max(rel)), "rms": float(np.sqrt(np.mean(rel**2)))}
+    return table
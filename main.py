@@ -1,5 +1,5 @@
 import numpy as np
-from solver import calculate
+from solver import sweep
 import postprocess as g
 import time
 
@@ -8,13 +8,12 @@ temperatures = np.linspace(300, 2000, 1000)  # Example temperature range from 30
 pressures = [11, 110, 550, 1100, 11000]  # Example pressures in Pa
 param_file = 'Sio2_para.py'  # Path to the parameter file
 
-results_list = []
 # Track total runtime
 total_start = time.time()
-    
-for pressure in pressures:
-    results = calculate(temperatures, [pressure], param_file)
-    results_list.append(results)
+
+# All pressures in one call, then one DataFrame per pressure for plotting
+results = sweep(temperatures, pressures, param_file)
+results_list = results.frames("P")
 
 g.plot_multigamma(results_list, [1100])
 
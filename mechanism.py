@@ -0,0 +1,345 @@
+import json
+import math
+
+import numpy as np
+
+from diagnostics import CONVERGED, FALLBACK, FAILED
+
+# A mechanism is a plain dictionary (or JSON file):
+#
+#   {
+#     "site_density": 5e18,                                  # sites / m^2
+#     "hopping": {"cA": 3.5, "delta": 5e-10},                # surface hopping frequency of LH reactions
+#     "blocked": {"fraction": 0.8, "T_activation": 4.15e-21}, # sites blocked by fraction * (1 - exp(-T_activation / T))
+#     "species": {"O": {"mass": 2.66e-26}, ...},             # kg per molecule; every species adsorbs on one site
+#     "reactions": [
+#       {"type": "adsorption", "species": "O", "sticking": 0.05},
+#       {"type": "desorption", "species": "O", "E": 8.3e-19},
+#       {"type": "eley_rideal", "gas": "O", "adsorbed": "O", "P": 0.1, "E": 3.3e-20, "product": "O2"},
+#       {"type": "langmuir_hinshelwood", "adsorbed": ["O", "N"], "E": 6.8e-19, "product": "NO"},
+#       {"type": "arrhenius", "A": 1e13, "b": 0, "E": 1e-19, "orders": {"O": 1}, "gas": "N", "free": 0,
+#        "stoich": {"O": -1}, "product": "NO", "recombined": {"O": 1, "N": 1}},
+#     ],
+#     "gammas": {"gamma_OO": ["O2", "O"], ...},              # name: [product, species it is normalized by]
+#   }
+#
+# Energies are in J per molecule; "constants": {"kB": ..., "h": ...} overrides the CODATA values.
+# Every reaction compiles to the same form
+#   rate = A * T**b * exp(-E / (kB T)) * n_gas * free**f * prod(theta_s**order_s)
+# with the gas flux n_gas = p_gas / sqrt(2 pi m kB T), and d(theta_s)/dt * site_density = sum(stoich * rate).
+# A reaction may set "name" (used for its omega column), "consumes" (langmuir_hinshelwood) and "recombined".
+
+KB = 1.380649e-23
+H = 6.62607015e-34
+
+REACTION_TYPES = ("adsorption", "desorption", "eley_rideal", "langmuir_hinshelwood", "arrhenius")
+
+def _merge(*species):
+    counts = {}
+    for s in species:
+        counts[s] = counts.get(s, 0) + 1
+    return counts
+
+class Mechanism:
+    """
+    Surface mechanism compiled into arrays: per reaction a prefactor, temperature exponent,
+    activation temperature, gas flux, free-site order and coverage orders, plus the stoichiometry matrix.
+    Production rates and Jacobians are then array operations over all grid points at once.
+    """
+
+    def __init__(self, definition):
+        self.definition = definition
+        constants = definition.get("constants") or {}
+        kB, h = float(constants.get("kB", KB)), float(constants.get("h", H))
+        self.species = tuple(definition["species"])
+        self.site_density = float(definition["site_density"])
+        index = {s: i for i, s in enumerate(self.species)}
+        N = len(self.species)
+        masses = np.array([float(definition["species"][s]["mass"]) for s in self.species])
+        # Gas flux per Pa is p / flux_scale / sqrt(T); hopping frequency is nu_scale * sqrt(T)
+        self.flux_scale = np.sqrt(2 * math.pi * masses * kB)
+        hopping = definition.get("hopping")
+        if hopping is not None:
+            self.nu_scale = (hopping["cA"] / hopping["delta"]) * np.sqrt(math.pi * kB / (2 * masses))
+        blocked = definition.get("blocked") or {}
+        self.blocked_fraction = float(blocked.get("fraction", 0.0))
+        self.blocked_T = float(blocked.get("T_activation", 0.0))
+
+        names, A, b, T_act, gas, free, orders, stoich, products, recombined = [], [], [], [], [], [], [], [], [], []
+        for r, reaction in enumerate(definition["reactions"]):
+            kind = reaction["type"]
+            E = float(reaction.get("E", 0.0))
+            order = np.zeros(N, dtype=np.int64)
+            nu = np.zeros(N)
+            g, f, atoms, product = -1, 0, {}, reaction.get("product")
+            if kind == "adsorption":
+                s = index[reaction["species"]]
+                a, exponent, g, f = float(reaction["sticking"]), 0.0, s, 1
+                nu[s] = 1
+            elif kind == "desorption":
+                s = index[reaction["species"]]
+                a, exponent = float(reaction.get("A", self.site_density * kB / h)), float(reaction.get("b", 1.0))
+                order[s] = 1
+                nu[s] = -1
+            elif kind == "eley_rideal":
+                s, g = index[reaction["adsorbed"]], index[reaction["gas"]]
+                a, exponent = float(reaction["P"]), 0.0
+                order[s] = 1
+                nu[s] = -1
+                atoms = _merge(reaction["gas"], reaction["adsorbed"])
+            elif kind == "langmuir_hinshelwood":
+                first, second = reaction["adsorbed"]
+                if hopping is None:
+                    raise ValueError("langmuir_hinshelwood reactions need the mechanism's hopping parameters")
+                a = (self.nu_scale[index[first]] + self.nu_scale[index[second]]) * self.site_density
+                exponent = 0.5
+                for s in (first, second):
+                    order[index[s]] += 1
+                atoms = reaction.get("consumes") or _merge(first, second)
+                for s, count in atoms.items():
+                    nu[index[s]] -= count
+            elif kind == "arrhenius":
+                a, exponent = float(reaction["A"]), float(reaction.get("b", 0.0))
+                g = index[reaction["gas"]] if reaction.get("gas") else -1
+                f = int(reaction.get("free", 0))
+                for s, count in reaction.get("orders", {}).items():
+                    order[index[s]] = count
+                for s, count in reaction.get("stoich", {}).items():
+                    nu[index[s]] = count
+            else:
+                raise ValueError(f"Unknown reaction type: {kind}, expected one of {REACTION_TYPES}")
+            names.append(reaction.get("name", f"omega_{kind}_{r}"))
+            A.append(a)
+            b.append(exponent)
+            T_act.append(E / kB)
+            gas.append(g)
+            free.append(f)
+            orders.append(order)
+            stoich.append(nu)
+            products.append(product)
+            recombined.append(reaction.get("recombined", atoms) if product else {})
+
+        self.reactions = tuple(names)
+        self.A = np.array(A)[:, None]
+        self.b = np.array(b)[:, None]
+        self.T_act = np.array(T_act)[:, None]
+        self.gas = np.array(gas)
+        self.free_order = np.array(free)[:, None]
+        self.orders = np.array(orders)
+        # Exponents of (theta_1 .. theta_N, free) per reaction, and with one factor differentiated out
+        exponents = np.column_stack([self.orders, self.free_order])
+        self._plan = self._factors(exponents)
+        self._dplans = [self._factors(np.maximum(exponents - np.eye(N + 1, dtype=int)[j], 0)) for j in range(N + 1)]
+        self._dcoeff = exponents.T[:, :, None].astype(float)
+        # (n_species, n_reactions)
+        self.stoich = np.array(stoich).T
+
+        gammas = definition.get("gammas") or {
+            f"gamma_{p}_{s}": [p, s] for p in dict.fromkeys(p for p in products if p) for s in self.species
+            if any(prod == p and atoms.get(s) for prod, atoms in zip(products, recombined))}
+        self.gammas = tuple(gammas)
+        # Atoms of the normalizing species recombined into the product, per reaction
+        self.gamma_matrix = np.array([[atoms.get(s, 0) if prod == p else 0 for prod, atoms in zip(products, recombined)]
+                                      for p, s in gammas.values()], dtype=float)
+        self.gamma_species = np.array([index[s] for _, s in gammas.values()])
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename) as f:
+            return cls(json.load(f))
+
+    def save(self, filename):
+        with open(filename, "w") as f:
+            json.dump(self.definition, f, indent=1)
+
+    def conditions(self, T, p, mole_fractions):
+        """
+        Rate constants (including the gas flux) of every reaction and the gas fluxes, for flat arrays of points.
+        :param mole_fractions: {species: scalar or array}; species not given have no gas phase.
+        :return: (K of shape (n_reactions, n), flux of shape (n_species, n), blocked fraction of shape (n,))
+        """
+        T, p = np.broadcast_arrays(np.asarray(T, dtype=float).ravel(), np.asarray(p, dtype=float).ravel())
+        x = np.array([np.broadcast_to(np.asarray(mole_fractions.get(s, 0.0), dtype=float).ravel(), T.shape)
+                      for s in self.species])
+        flux = p * x / (self.flux_scale[:, None] * np.sqrt(T))
+        K = self.A * T**self.b * np.exp(-self.T_act / T)
+        with_gas = self.gas >= 0
+        K[with_gas] *= flux[self.gas[with_gas]]
+        blocked = self.blocked_fraction * (1.0 - np.exp(-self.blocked_T / T))
+        return K, flux, blocked
+
+    @staticmethod
+    def _factors(exponents):
+        # (column, reactions) pairs: multiplying those reactions by the column once per pair builds the monomials
+        return [(j, np.flatnonzero(exponents[:, j] > k)) for j in range(exponents.shape[1])
+                for k in range(exponents[:, j].max(initial=0))]
+
+    @staticmethod
+    def _product(X, plan, n_reactions):
+        out = np.ones((n_reactions, X.shape[1]))
+        for j, rows in plan:
+            out[rows] *= X[j]
+        return out
+
+    def _stack(self, theta, blocked):
+        return np.vstack([theta, 1 - theta.sum(axis=0) - blocked])
+
+    def rates(self, theta, K, blocked):
+        """Rate of every reaction, shape (n_reactions, n)."""
+        return K * self._product(self._stack(theta, blocked), self._plan, len(self.reactions))
+
+    def production(self, theta, K, blocked):
+        """Net production of every adsorbate (site_density * dtheta/dt), shape (n_species, n)."""
+        return self.stoich @ self.rates(theta, K, blocked)
+
+    def jacobian(self, theta, K, blocked):
+        """d production_i / d theta_j, shape (n, n_species, n_species)."""
+        X = self._stack(theta, blocked)
+        R, N = len(self.reactions), len(self.species)
+        # Every theta_j appears in the free site fraction with d(free)/d(theta_j) = -1
+        dfree = self._dcoeff[N] * self._product(X, self._dplans[N], R)
+        jac = np.empty((theta.shape[1], N, N))
+        for j in range(N):
+            drate = K * (self._dcoeff[j] * self._product(X, self._dplans[j], R) - dfree)
+            jac[:, :, j] = (self.stoich @ drate).T
+        return jac
+
+    def _scale(self, K):
+        # Adsorption flux onto a bare surface, makes the residuals dimensionless
+        adsorbing = (self.free_order[:, 0] > 0) & (self.stoich > 0).any(axis=0)
+        scale = K[adsorbing].sum(axis=0) if adsorbing.any() else np.ones(K.shape[1])
+        return np.where(scale > 0, scale, 1.0)
+
+    def _physical(self, theta, blocked, tol=1e-9):
+        return ((theta >= -tol).all(axis=0) & (theta <= 1 + tol).all(axis=0)
+                & (1 - theta.sum(axis=0) - blocked >= -tol))
+
+    def _valid(self, theta, K, blocked, rtol=1e-6):
+        # Physical coverages with a small scaled residual
+        with np.errstate(invalid="ignore", over="ignore"):
+            small = np.abs(self.production(theta, K, blocked)).max(axis=0) <= rtol * self._scale(K)
+        return small & self._physical(theta, blocked)
+
+    def newton(self, theta, K, blocked, ftol=1e-10, xtol=1.49012e-08, maxiter=50, max_halvings=30):
+        """
+        Damped Newton iteration on the steady state of all points at once.
+        :return: (theta, converged)
+        """
+        theta = np.array(theta, dtype=float)
+        n = theta.shape[1]
+        converged = np.zeros(n, dtype=bool)
+        idx = np.arange(n)
+        t, k, bl = theta, K, blocked
+        s = self._scale(k)
+        F = self.production(t, k, bl)
+        for _ in range(maxiter):
+            J = self.jacobian(t, k, bl)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                step = np.linalg.solve(J, -F.T[:, :, None])[:, :, 0].T
+            step = np.where(np.isfinite(step), step, 0.0)
+
+            merit = np.maximum(((F / s)**2).sum(axis=0), (1e-2 * ftol)**2)
+            lam = np.ones(t.shape[1])
+            for _ in range(max_halvings):
+                G = self.production(t + lam * step, k, bl)
+                reject = ~(((G / s)**2).sum(axis=0) <= (1 - 1e-4 * lam) * merit)
+                if not reject.any():
+                    break
+                lam = np.where(reject, 0.5 * lam, lam)
+            else:
+                G = None
+
+            t = t + lam * step
+            theta[:, idx] = t
+            F = G if G is not None else self.production(t, k, bl)
+            res = np.abs(F).max(axis=0) / s
+            small = np.abs(lam * step).max(axis=0) <= xtol * np.maximum(np.abs(t).sum(axis=0), xtol)
+            done = (small & (res <= ftol)) | (res == 0)
+            converged[idx[done]] = True
+
+            keep = ~done & np.isfinite(t).all(axis=0)
+            if not keep.any():
+                break
+            idx, t, k, bl, s, F = idx[keep], t[:, keep], k[:, keep], bl[keep], s[keep], F[:, keep]
+        return theta, converged
+
+    def solve(self, T, p, mole_fractions, theta0=None):
+        """
+        Steady-state coverages for flat arrays of points: batched Newton, then fsolve for the points it misses.
+        :return: (theta of shape (n_species, n), K, flux, blocked, status); status holds CONVERGED, FALLBACK
+                 for the points fsolve solved, or FAILED (see diagnostics.STATUS_NAMES).
+        """
+        K, flux, blocked = self.conditions(T, p, mole_fractions)
+        n = K.shape[1]
+        N = len(self.species)
+        guess = np.full((N, n), 0.5 / N) if theta0 is None else np.broadcast_to(theta0, (N, n))
+        theta, converged = self.newton(guess, K, blocked)
+        status = np.where(converged & self._physical(theta, blocked), CONVERGED, FAILED).astype(np.int8)
+        retry = np.flatnonzero(status == FAILED)
+        if retry.size:
+            from scipy.optimize import fsolve
+            ier = np.empty(retry.size, dtype=int)
+            for j, i in enumerate(retry):
+                k, bl = K[:, i:i + 1], blocked[i:i + 1]
+                theta[:, i], _, ier[j], _ = fsolve(lambda x: self.production(x[:, None], k, bl)[:, 0], guess[:, i],
+                                                   fprime=lambda x: self.jacobian(x[:, None], k, bl)[0],
+                                                   full_output=True)
+            # fsolve may stop anywhere, so its answers are checked like the escalation of the O/N solver does;
+            # a stop without convergence (often "not making good progress" right at the root) must meet Newton's ftol
+            rtol = np.where(ier == 1, 1e-6, 1e-10)
+            ok = self._valid(theta[:, retry], K[:, retry], blocked[retry], rtol=rtol)
+            status[retry] = np.where(ok, FALLBACK, FAILED)
+        return theta, K, flux, blocked, status
+
+    def gamma(self, theta, K, flux, blocked):
+        """Recombination coefficients {name: array}: product atoms of a species per incident atom of it."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = (self.gamma_matrix @ self.rates(theta, K, blocked)) / flux[self.gamma_species]
+        return dict(zip(self.gammas, values))
+
+    def calculate(self, T, p, mole_fractions):
+        """
+        Steady state at flat arrays of points.
+        :return: Dictionary with theta_<species>, T, P, the gamma columns, an omega column per reaction
+                 and the status of every point.
+        """
+        T, p = np.broadcast_arrays(np.asarray(T, dtype=float).ravel(), np.asarray(p, dtype=float).ravel())
+        theta, K, flux, blocked, status = self.solve(T, p, mole_fractions)
+        res_dict = {f"theta_{s}": theta[i] for i, s in enumerate(self.species)}
+        res_dict.update(T=T, P=p, x=1000 / T)
+        res_dict.update(self.gamma(theta, K, flux, blocked))
+        res_dict.update(zip(self.reactions, self.rates(theta, K, blocked)))
+        res_dict["status"] = status
+        return res_dict
+
+def on_mechanism(params):
+    """The O/N mechanism of solver.calculate built from a Parameters set; reproduces its gamma_* columns."""
+    return Mechanism({
+        "constants": {"kB": params.kB, "h": params.h},
+        "site_density": params.nsite,
+        "hopping": {"cA": params.cA, "delta": params.delta},
+        "blocked": {"fraction": params.AA, "T_activation": params.T_OH},
+        "species": {"O": {"mass": params.mass_O}, "N": {"mass": params.mass_N}},
+        "reactions": [
+            {"name": "omega_ad_O", "type": "adsorption", "species": "O", "sticking": params.s_O},
+            {"name": "omega_ad_N", "type": "adsorption", "species": "N", "sticking": params.s_N},
+            {"name": "omega_ER_OO", "type": "eley_rideal", "gas": "O", "adsorbed": "O", "P": params.P_erOO,
+             "E": params.Q_erOO, "product": "O2"},
+            {"name": "omega_ER_NN", "type": "eley_rideal", "gas": "N", "adsorbed": "N", "P": params.P_erNN,
+             "E": params.Q_erNN, "product": "N2"},
+            {"name": "omega_ER_ON", "type": "eley_rideal", "gas": "O", "adsorbed": "N", "P": params.P_erON,
+             "E": params.Q_erON, "product": "NO"},
+            {"name": "omega_ER_NO", "type": "eley_rideal", "gas": "N", "adsorbed": "O", "P": params.P_erNO,
+             "E": params.Q_erNO, "product": "NO"},
+            # The O/N model counts the rate of a like-pair LH reaction as atoms removed, not as events
+            {"name": "omega_LH_OO", "type": "langmuir_hinshelwood", "adsorbed": ["O", "O"], "E": params.Q_lhOO,
+             "product": "O2", "consumes": {"O": 1}},
+            {"name": "omega_LH_NN", "type": "langmuir_hinshelwood", "adsorbed": ["N", "N"], "E": params.Q_lhNN,
+             "product": "N2", "consumes": {"N": 1}},
+            {"name": "omega_LH_NO", "type": "langmuir_hinshelwood", "adsorbed": ["O", "N"], "E": params.Q_lhNO,
+             "product": "NO"},
+            {"name": "omega_des_O", "type": "desorption", "species": "O", "E": params.Qa_O},
+            {"name": "omega_des_N", "type": "desorption", "species": "N", "E": params.Qa_N},
+        ],
+        "gammas": {"gamma_OO": ["O2", "O"], "gamma_NN": ["N2", "N"], "gamma_ON": ["NO", "O"], "gamma_NO": ["NO", "N"]},
+    })
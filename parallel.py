@@ -0,0 +1,71 @@
+import os
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from parameters import load_parameters
+from solver import RESULT_COLUMNS, solve_points, format_results, resolve_composition
+
+# Per-process state of the pool workers, set once per worker by init_worker
+worker_state = {}
+
+def init_worker(setup, *args):
+    """Replace worker_state by setup(*args); pools run it in every worker, serial callers in their own process."""
+    worker_state.clear()
+    worker_state.update(setup(*args))
+
+def worker_pool(max_workers, mp_context=None, setup=None, initargs=()):
+    """
+    ProcessPoolExecutor whose workers run init_worker(setup, *initargs) once when they start.
+    :param mp_context: Start method ('fork', 'spawn', 'forkserver') or a multiprocessing context.
+    """
+    if isinstance(mp_context, str):
+        mp_context = multiprocessing.get_context(mp_context)
+    if setup is None:
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context)
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context,
+                               initializer=init_worker, initargs=(setup,) + tuple(initargs))
+
+def _setup(param_file, axes):
+    return {"params": load_parameters(param_file), "axes": axes}
+
+def _solve_chunk(start, stop, method):
+    T_axis, P_axis, C_axis = worker_state["axes"]
+    i, j, k = np.unravel_index(np.arange(start, stop), (T_axis.size, P_axis.size, C_axis.size))
+    res_dict = solve_points(worker_state["params"], T_axis[i], P_axis[j], C_axis[k], method=method)
+    return start, np.stack([res_dict[name] for name in RESULT_COLUMNS])
+
+def grid_axes(temperatures, pressures, C_O):
+    return tuple(np.atleast_1d(np.asarray(v, dtype=float)) for v in (temperatures, pressures, C_O))
+
+def calculate_parallel(temperatures, pressures, param_file, C_O=10/11, method="newton",
+                       max_workers=None, chunk_size=None, mp_context=None, output="dataframe"):
+    """
+    Solve the grid temperatures x pressures x C_O on a process pool.
+    Rows come back in the same order as solver.calculate (temperatures outermost, C_O innermost).
+    :param max_workers: Number of processes, all cores by default.
+    :param chunk_size: Grid points per task; by default every worker gets about four tasks.
+    :param mp_context: Start method ('fork', 'spawn', 'forkserver') or a multiprocessing context.
+    """
+    # Workers load the file themselves, so they must not depend on our working directory
+    param_file = os.path.abspath(param_file)
+    C_O = resolve_composition(load_parameters(param_file), C_O)
+    axes = grid_axes(temperatures, pressures, C_O)
+    n = math.prod(axis.size for axis in axes)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, math.ceil(n / (4 * max_workers)))
+
+    block = np.empty((len(RESULT_COLUMNS), n))
+    with worker_pool(max_workers, mp_context, _setup, (param_file, axes)) as executor:
+        futures = [executor.submit(_solve_chunk, start, min(start + chunk_size, n), method)
+                   for start in range(0, n, chunk_size)]
+        # Place every chunk by its offset, so the order does not depend on completion order
+        for future in as_completed(futures):
+            start, part = future.result()
+            block[:, start:start + part.shape[1]] = part
+
+    return format_results(dict(zip(RESULT_COLUMNS, block)), output)
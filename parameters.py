@@ -0,0 +1,175 @@
+import os
+import math
+import hashlib
+import importlib.util
+
+import numpy as np
+
+# Values read from a parameter file; C0 and the energies behind Q_lh* are optional
+PARAMETER_NAMES = (
+    "kB", "Na", "h",
+    "s_O", "s_N",
+    "cA", "delta", "nsite",
+    "AA", "E_OH",
+    "P_erOO", "P_erNN", "P_erON", "P_erNO",
+    "Q_erOO", "Q_erNN", "Q_erON", "Q_erNO",
+    "Qa_O", "Qa_N",
+    "Q_lhOO", "Q_lhNN", "Q_lhNO",
+    "mass_O", "mass_N",
+)
+OPTIONAL_NAMES = ("C0", "D_OO", "D_NN", "D_NO", "Em_O", "Em_N")
+# Parameters behind Q_lh* in the parameter files: Q_lh = max(Em, 2 Qa - D) or Qa_O + Qa_N - D_NO
+LH_INPUTS = ("Em_O", "Em_N", "D_OO", "D_NN", "D_NO", "Qa_O", "Qa_N")
+
+# Constants derived once per parameter set
+DERIVED_NAMES = (
+    # Activation temperatures Q / kB
+    "T_erOO", "T_erNN", "T_erON", "T_erNO",
+    "T_lhOO", "T_lhNN", "T_lhNO",
+    "T_aO", "T_aN",
+    "T_OH",
+    # Flux n = p / (flux * sqrt(T))
+    "flux_O", "flux_N",
+    # Hopping frequency v = nu * sqrt(T)
+    "nu_O", "nu_N",
+    # Desorption prefactor nsite * kB * T / h = k_des * T
+    "k_des",
+)
+
+class Parameters:
+    """
+    Immutable parameter set with the derived constants of the rate expressions precomputed.
+    Build it with Parameters(**values), Parameters.from_module or load_parameters.
+    """
+    __slots__ = PARAMETER_NAMES + OPTIONAL_NAMES + DERIVED_NAMES + ("_key",)
+
+    def __init__(self, **values):
+        missing = [name for name in PARAMETER_NAMES if name not in values]
+        if missing:
+            raise AttributeError(f"Missing parameters: {', '.join(missing)}")
+        unknown = [name for name in values if name not in PARAMETER_NAMES + OPTIONAL_NAMES]
+        if unknown:
+            raise AttributeError(f"Unknown parameters: {', '.join(unknown)}")
+
+        init = object.__setattr__
+        for name in PARAMETER_NAMES + OPTIONAL_NAMES:
+            init(self, name, values.get(name))
+        init(self, "_key", tuple(values.get(name) for name in PARAMETER_NAMES + OPTIONAL_NAMES))
+
+        kB = self.kB
+        init(self, "T_erOO", self.Q_erOO / kB)
+        init(self, "T_erNN", self.Q_erNN / kB)
+        init(self, "T_erON", self.Q_erON / kB)
+        init(self, "T_erNO", self.Q_erNO / kB)
+        init(self, "T_lhOO", self.Q_lhOO / kB)
+        init(self, "T_lhNN", self.Q_lhNN / kB)
+        init(self, "T_lhNO", self.Q_lhNO / kB)
+        init(self, "T_aO", self.Qa_O / kB)
+        init(self, "T_aN", self.Qa_N / kB)
+        init(self, "T_OH", self.E_OH / self.Na)
+        # sqrt() of the parameter products keeps complex perturbations working
+        init(self, "flux_O", (2 * math.pi * self.mass_O * kB)**0.5)
+        init(self, "flux_N", (2 * math.pi * self.mass_N * kB)**0.5)
+        init(self, "nu_O", (self.cA / self.delta) * (math.pi * kB / (2 * self.mass_O))**0.5)
+        init(self, "nu_N", (self.cA / self.delta) * (math.pi * kB / (2 * self.mass_N))**0.5)
+        init(self, "k_des", self.nsite * kB / self.h)
+
+    @classmethod
+    def from_module(cls, module):
+        values = {}
+        for name in PARAMETER_NAMES:
+            if not hasattr(module, name):
+                raise AttributeError(f"Parameter file does not define {name}")
+            values[name] = getattr(module, name)
+        for name in OPTIONAL_NAMES:
+            if hasattr(module, name):
+                values[name] = getattr(module, name)
+        return cls(**values)
+
+    def as_dict(self):
+        """Parameter values as read, without the derived constants."""
+        return {name: getattr(self, name) for name in PARAMETER_NAMES + OPTIONAL_NAMES
+                if getattr(self, name) is not None}
+
+    def fingerprint(self):
+        """SHA-256 of the exact parameter values, independent of the file they came from."""
+        text = ";".join(f"{k}={float(v).hex() if isinstance(v, (int, float)) else repr(v)}"
+                        for k, v in self.as_dict().items())
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def replace(self, **changes):
+        values = self.as_dict()
+        values.update(changes)
+        return Parameters(**values)
+
+    def derive(self, **changes):
+        """
+        replace() that also re-derives Q_lh* the way the parameter files do when Em_*, D_* or Qa_* change.
+        Needs all of LH_INPUTS to be set; Q_lh* given explicitly in changes are kept. Values may be arrays.
+        """
+        current = {**self.as_dict(), **changes}
+        if any(name in changes for name in LH_INPUTS) and all(current.get(name) is not None for name in LH_INPUTS):
+            derived = {
+                "Q_lhOO": np.maximum(current["Em_O"], 2.0 * current["Qa_O"] - current["D_OO"]),
+                "Q_lhNN": np.maximum(current["Em_N"], 2.0 * current["Qa_N"] - current["D_NN"]),
+                "Q_lhNO": current["Qa_O"] + current["Qa_N"] - current["D_NO"],
+            }
+            changes = {**derived, **changes}
+        return self.replace(**changes)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Parameters are read-only, use replace()")
+
+    def __delattr__(self, name):
+        raise AttributeError("Parameters are read-only, use replace()")
+
+    def __eq__(self, other):
+        return isinstance(other, Parameters) and self._key == other._key
+
+    def __hash__(self):
+        return hash(self._key)
+
+    def __reduce__(self):
+        return (_rebuild, (self.as_dict(),))
+
+    def __repr__(self):
+        return "Parameters(" + ", ".join(f"{k}={v!r}" for k, v in self.as_dict().items()) + ")"
+
+def _rebuild(values):
+    return Parameters(**values)
+
+# Loaded parameter sets by absolute path, invalidated when the file changes
+_parameter_cache = {}
+
+def load_parameters(param_file):
+    path = os.path.abspath(param_file)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _parameter_cache.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    spec = importlib.util.spec_from_file_location("params", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    params = Parameters.from_module(module)
+    _parameter_cache[path] = (stamp, params)
+    return params
+
+def save_parameters(params, param_file, header=None):
+    """
+    Write a parameter set as a parameter file that load_parameters reads back exactly.
+    :param header: Comment lines put at the top, e.g. where the values came from.
+    """
+    lines = []
+    for line in (header.splitlines() if header else []):
+        lines.append(f"# {line}")
+    if lines:
+        lines.append("")
+    for name, value in params.as_dict().items():
+        # NumPy scalars would write as np.float64(...)
+        value = value.item() if hasattr(value, "item") else value
+        lines.append(f"{name} = {value!r}")
+    with open(param_file, "w") as f:
+        f.write("\n".join(lines) + "\n")
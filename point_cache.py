@@ -0,0 +1,140 @@
+import os
+import time
+import sqlite3
+import hashlib
+
+import numpy as np
+
+# Solved grids on disk, one blob per grid keyed by (parameter fingerprint, columns, method, grid axes).
+# Looking points up one by one through SQLite costs more than a batched Newton solve of them,
+# so only whole grids are reused; a grid that merely overlaps an earlier one is solved again.
+# SQLite in WAL mode lets several processes read and write the same cache file.
+
+class PointCache:
+    """
+    Persistent, size-bounded cache of solved grids with least-recently-used eviction.
+    :param max_entries: Grid points kept at most; the least recently used grids are evicted beyond that.
+    """
+
+    def __init__(self, path, max_entries=10_000_000, timeout=60.0):
+        self.path = path
+        self.max_entries = max_entries
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS grids (key TEXT PRIMARY KEY, size INTEGER, data BLOB, last_used INTEGER)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS grids_last_used ON grids (last_used)")
+        # Running point count, kept by triggers so eviction never has to scan the table
+        self._db.execute("CREATE TABLE IF NOT EXISTS total (id INTEGER PRIMARY KEY CHECK (id = 0), size INTEGER)")
+        self._db.execute("INSERT OR IGNORE INTO total VALUES (0, 0)")
+        self._db.execute("CREATE TRIGGER IF NOT EXISTS grids_insert AFTER INSERT ON grids"
+                         " BEGIN UPDATE total SET size = size + NEW.size; END")
+        self._db.execute("CREATE TRIGGER IF NOT EXISTS grids_delete AFTER DELETE ON grids"
+                         " BEGIN UPDATE total SET size = size - OLD.size; END")
+
+    @staticmethod
+    def key(params, columns, method, axes):
+        # The column layout and the solver method are part of the key, so neither change returns stale results
+        digest = hashlib.sha256((params.fingerprint() + "|" + ",".join(columns) + "|" + method).encode())
+        for axis in axes:
+            digest.update(np.ascontiguousarray(axis, dtype="<f8").tobytes() + b"|")
+        return digest.hexdigest()
+
+    def lookup(self, key, n_columns):
+        """
+        :return: (n_columns, n) block of the cached grid, or None.
+        """
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT data FROM grids WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                db.execute("UPDATE grids SET last_used = ? WHERE key = ?", (time.time_ns(), key))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        # A block that owns its memory, so its rows have it as their base like the blocks of solve_grid
+        data = np.frombuffer(row[0], dtype="<f8")
+        block = np.empty((n_columns, data.size // n_columns))
+        block.reshape(-1)[:] = data
+        return block
+
+    def store(self, key, block):
+        """Insert a solved grid; block is (n_columns, n)."""
+        data = np.ascontiguousarray(block, dtype="<f8")
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent writers queue instead of deadlocking
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have stored the same grid meanwhile; its result is the same
+            db.execute("INSERT OR IGNORE INTO grids VALUES (?, ?, ?, ?)",
+                       (key, data.shape[1], data.tobytes(), time.time_ns()))
+            self._evict()
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def __len__(self):
+        return self._db.execute("SELECT size FROM total").fetchone()[0]
+
+    def _evict(self):
+        # Inside an open transaction
+        excess = len(self) - self.max_entries
+        if excess <= 0:
+            return 0
+        victims = []
+        for key, size in self._db.execute("SELECT key, size FROM grids ORDER BY last_used"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._db.executemany("DELETE FROM grids WHERE key = ?", victims)
+        return len(victims)
+
+    def evict(self):
+        """Drop the least recently used grids until at most max_entries points are left."""
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            deleted = self._evict()
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return deleted
+
+    def clear(self):
+        self._db.execute("DELETE FROM grids")
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def solve(self, params, axes, columns, method, solve_fn, keep=None):
+        """
+        Results on the grid spanned by axes, solved only if the cache does not hold it yet.
+        :param method: Name of the solver settings, part of the key.
+        :param solve_fn: solve_fn() -> dict of the result columns of the whole grid.
+        :param keep: keep(results) -> bool, whether the solved grid may be stored, e.g. only if every point converged.
+        :return: (n_columns, n) result block.
+        """
+        key = self.key(params, columns, method, axes)
+        block = self.lookup(key, len(columns))
+        if block is None:
+            solved = solve_fn()
+            block = np.stack([np.asarray(solved[name], dtype=float) for name in columns])
+            if keep is None or keep(solved):
+                self.store(key, block)
+        return block
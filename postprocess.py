@@ -1,123 +1,336 @@
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib import rcParams
-from matplotlib.font_manager import FontProperties
-from matplotlib.ticker import AutoMinorLocator, LogLocator
-from matplotlib.ticker import ScalarFormatter, FormatStrFormatter
+import os
 import math
-# Define the path to the Times New Roman font on Windows
-font_properties = FontProperties(fname='C:\\Windows\\Fonts\\times.ttf')
-TICK_LABEL_SIZE = 16  # Increased tick label size
+import functools
+import importlib
+
+import numpy as np
 
-# Update rcParams to use Times New Roman for all text elements
-rcParams['font.family'] = 'serif'
-rcParams['font.serif'] = ['Times New Roman'] + rcParams['font.serif']
-rcParams['mathtext.fontset'] = 'custom'
-rcParams['mathtext.rm'] = 'Times New Roman'
+from parallel import worker_pool, init_worker, worker_state
+
+TICK_LABEL_SIZE = 16  # Increased tick label size
+# Serif fonts in order of preference; the first one installed is used
+SERIF_FONTS = ('Times New Roman', 'Times', 'Nimbus Roman', 'Nimbus Roman No9 L', 'TeX Gyre Termes',
+               'Liberation Serif', 'DejaVu Serif')
+
+@functools.lru_cache(maxsize=None)
+def resolve_font(families=SERIF_FONTS):
+    """
+    FontProperties of the first installed font of families, looked up through matplotlib's
+    font cache instead of a hard-coded path; resolved once per process.
+    """
+    from matplotlib.font_manager import FontProperties, findfont
+    for family in families:
+        try:
+            return FontProperties(fname=findfont(FontProperties(family=family), fallback_to_default=False))
+        except ValueError:
+            continue
+    return FontProperties(fname=findfont(FontProperties(family='serif')))
+
+@functools.lru_cache(maxsize=None)
+def _matplotlib():
+    # Imported and styled on first use, so importing this module (and the scripts that do) stays cheap
+    import matplotlib
+    from matplotlib import rcParams
+
+    # Update rcParams to use Times New Roman (or the closest installed serif) for all text elements
+    family = resolve_font().get_name()
+    rcParams['font.family'] = 'serif'
+    rcParams['font.serif'] = [family] + rcParams['font.serif']
+    rcParams['mathtext.fontset'] = 'custom'
+    rcParams['mathtext.rm'] = family
+    return matplotlib
+
+class _LazyModule:
+    """Stands in for a matplotlib module until an attribute of it is first used."""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        _matplotlib()
+        module = importlib.import_module(self._name)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+plt = _LazyModule('matplotlib.pyplot')
+ticker = _LazyModule('matplotlib.ticker')
+mfigure = _LazyModule('matplotlib.figure')
 
 xlabel1 = r'1000/T $[\mathrm{K}^{-1}]$'
 save_path = 'E:\\Project\\cross-sectional project'
-def apply_plot_formatting(x_label, y_label, title=None):
-    plt.xlabel(x_label, fontsize=20)
-    plt.ylabel(y_label, fontsize=20)
-    if title:
-        plt.title(title, fontsize=20)
-    plt.legend(fontsize=16, 
-               frameon=True, 
-               framealpha=1, 
-               edgecolor='black', 
-               fancybox=False,
-               borderpad=0.3, labelspacing=0.2
-               )
-    plt.grid(which='both', linestyle='--', linewidth=1)  # Set grid lines to be dashed
+def style_axes(ax):
+    """Frame, ticks and grid of every figure; independent of the data, so a template keeps it."""
+    ax.grid(which='both', linestyle='--', linewidth=1)  # Set grid lines to be dashed
 
     # Set the linewidth of the x and y axes
-    plt.gca().spines['top'].set_linewidth(2)
-    plt.gca().spines['bottom'].set_linewidth(2)
-    plt.gca().spines['left'].set_linewidth(2)
-    plt.gca().spines['right'].set_linewidth(2)
+    for spine in ax.spines.values():
+        spine.set_linewidth(2)
 
     # Enable minor ticks
-    plt.gca().minorticks_on()
+    ax.minorticks_on()
     # Automatically adjust minor ticks to have one minor tick between each pair of major ticks on x-axis
-    plt.gca().xaxis.set_minor_locator(AutoMinorLocator(2))
-
+    ax.xaxis.set_minor_locator(ticker.AutoMinorLocator(2))
+
+    # Make ticks inline
+    ax.tick_params(axis='both', which='major', direction='in', length=6, width=1.5, pad=5)
+    ax.tick_params(axis='both', which='minor', direction='in', length=3, width=1, pad=5)
+    ax.tick_params(axis='x', which='both', top=True, bottom=True)
+    ax.tick_params(axis='y', which='both', left=True, right=True)
+
+def apply_plot_formatting(x_label, y_label, title=None, ax=None):
+    ax = ax or plt.gca()
+    ax.set_xlabel(x_label, fontsize=20)
+    ax.set_ylabel(y_label, fontsize=20)
+    if title:
+        ax.set_title(title, fontsize=20)
+    ax.legend(fontsize=16, 
+              frameon=True, 
+              framealpha=1, 
+              edgecolor='black', 
+              fancybox=False,
+              borderpad=0.3, labelspacing=0.2
+              )
+    style_axes(ax)
 
     # Set minor ticks for y-axis on a logarithmic scale
-    plt.gca().yaxis.set_minor_locator(LogLocator(base=10.0, subs='auto', numticks=10))
-
-    # Set font properties for tick labels and make ticks inline
-    plt.gca().tick_params(axis='both', which='major', direction='in', length=6, width=1.5, pad=5)
-    plt.gca().tick_params(axis='both', which='minor', direction='in', length=3, width=1, pad=5)
-    plt.gca().tick_params(axis='x', which='both', top=True, bottom=True)
-    plt.gca().tick_params(axis='y', which='both', left=True, right=True)
+    ax.yaxis.set_minor_locator(ticker.LogLocator(base=10.0, subs='auto', numticks=10))
 
-    for label in plt.gca().get_xticklabels() + plt.gca().get_yticklabels():
-        label.set_fontproperties(font_properties)
+    # Set font properties for tick labels, also for the ticks created when the limits change later
+    ax.tick_params(axis='both', which='both', labelsize=TICK_LABEL_SIZE, labelfontfamily=resolve_font().get_name())
+    for label in ax.get_xticklabels() + ax.get_yticklabels():
+        label.set_fontproperties(resolve_font())
         label.set_fontsize(TICK_LABEL_SIZE)  # Set the font size for tick labels
 
+# Declarative figures: which gamma columns against which x column, limits, and how the
+# results are grouped into series ('pressure' or 'composition', the value of each results frame)
+FIGURE_DEFAULTS = {
+    'columns': ('gamma_OO',),
+    'x': 'x',
+    'x_label': xlabel1,
+    'y_label': 'Recombination coefficient',
+    'title': None,
+    'xlim': None,
+    'ylim': None,
+    'series': 'pressure',
+    'label': None,
+    'linewidth': None,
+    'scientific': False,
+    'figsize': (8, 6),
+    # Points kept per line: 'auto' for one per pixel column of the figure, an int, or None for all
+    'max_points': 'auto',
+}
+
+GAMMA_FIGURES = {
+    'multigamma': dict(columns=('gamma_OO', 'gamma_NN', 'gamma_ON', 'gamma_NO'), figsize=(10, 6),
+                       label='{column}, P={value} Pa', linewidth=1),
+    'gamma_OO': dict(columns=('gamma_OO',), xlim=(0.3, 1), ylim=(1e-3, 1e-1), label='Pressure: {value} Pa'),
+    'gamma_NN': dict(columns=('gamma_NN',), xlim=(0.25, 2), ylim=(1e-4, 1e-1)),
+    'gamma_NO': dict(columns=('gamma_NO',), xlim=(0.3, 1.5), ylim=(0.4e-2, 3e-2), scientific=True),
+    'gamma_ON': dict(columns=('gamma_ON',), xlim=(0.3, 1), ylim=(4e-4, 4e-3), scientific=True),
+    'gamma_ratio': dict(columns=('gamma_OO',), series='composition', x='T', x_label='T [K]',
+                        xlim=(300, 5000), ylim=(1e-4, 1e-1)),
+    'gamma_ratio_NN': dict(columns=('gamma_NN',), series='composition', x='T', x_label='T [K]',
+                           xlim=(300, 5000), ylim=(1e-4, 1e-1)),
+    'gamma_ratio_NO': dict(columns=('gamma_NO',), series='composition', x='T', x_label='T [K]',
+                           xlim=(300, 5000), ylim=(1e-4, 1e-1)),
+    'gamma_ratio_ON': dict(columns=('gamma_ON',), series='composition', x='T', x_label='T [K]',
+                           xlim=(300, 5000), ylim=(1e-4, 1e-1)),
+}
+
+def figure_spec(spec, **changes):
+    """Complete figure spec from a name in GAMMA_FIGURES or a dict, with FIGURE_DEFAULTS filled in."""
+    if isinstance(spec, str):
+        spec = dict(GAMMA_FIGURES[spec], name=spec)
+    spec = {**FIGURE_DEFAULTS, **spec, **changes}
+    spec.setdefault('name', '_'.join(spec['columns']))
+    return spec
+
+def _ratio_label(C0):
+    CO_ratio = C0 * 100
+    CN_ratio = (1 - C0) * 100
+    divisor = math.gcd(int(CO_ratio), int(CN_ratio))
+    return f'C0:CN = {CO_ratio / divisor:.0f}:{CN_ratio / divisor:.0f}'
+
+def _series_label(spec, value, column):
+    if spec['label'] is not None:
+        return spec['label'].format(value=value, column=column)
+    if spec['series'] == 'composition':
+        return _ratio_label(value)
+    return f'P={value} Pa'
+
+def _column(results, name):
+    if name == 'x' and 'x' not in results:
+        return 1000 / np.asarray(results['T'])
+    return np.asarray(results[name])
+
+def lttb(x, y, n_out):
+    """
+    Largest-triangle-three-buckets decimation: keeps the first and last point and, from each of
+    n_out - 2 equal buckets in between, the point spanning the largest triangle with the point kept
+    in the bucket before and the mean of the bucket after. All buckets are done at once, so the point
+    before comes from a first pass anchored on bucket means; on smooth curves like gamma(1000/T) the
+    result is within a small fraction of a pixel of sequential LTTB.
+    Areas scale uniformly with each axis, so x and y can be in any units, but they should be the
+    plotted coordinates (e.g. log10 of a log axis).
+    :return: Indices of the kept points, ascending.
+    """
+    n = x.size
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    lo, hi = edges[:-1], edges[1:]
+    # (bucket, slot) indices, padded by repeating the last point of the bucket
+    index = np.minimum(lo[:, None] + np.arange((hi - lo).max()), hi[:, None] - 1)
+    bx, by = x[index], y[index]
+    mx, my = np.add.reduceat(x[1:n - 1], lo - 1) / (hi - lo), np.add.reduceat(y[1:n - 1], lo - 1) / (hi - lo)
+    # Mean of the next bucket; the last bucket looks at the last point
+    cx, cy = np.append(mx[1:], x[-1])[:, None], np.append(my[1:], y[-1])[:, None]
+
+    def pick(ax_, ay_):
+        area = np.abs((ax_ - cx) * (by - ay_) - (ax_ - bx) * (cy - ay_))
+        return index[np.arange(index.shape[0]), np.argmax(area, axis=1)]
+
+    kept = pick(np.append(x[0], mx[:-1])[:, None], np.append(y[0], my[:-1])[:, None])
+    kept = pick(np.append(x[0], x[kept[:-1]])[:, None], np.append(y[0], y[kept[:-1]])[:, None])
+    return np.concatenate([[0], kept, [n - 1]])
+
+def decimate(x, y, n_out, log_y=True):
+    """
+    Reduce a line to about n_out points that draw the same, with lttb in the plotted coordinates.
+    Points that a log axis cannot show split the line, like they do in matplotlib.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    if n_out is None or x.size <= n_out:
+        return x, y
+    with np.errstate(divide='ignore', invalid='ignore'):
+        v = np.log10(y) if log_y else y
+    finite = np.isfinite(x) & np.isfinite(v)
+    if finite.all():
+        kept = lttb(x, v, n_out)
+        return x[kept], y[kept]
+    # Decimate every finite run on its share of the points, with NaN breaks between runs
+    bounds = np.flatnonzero(np.diff(np.concatenate([[0], finite.astype(np.int8), [0]])))
+    xs, ys = [], []
+    for start, stop in zip(bounds[::2], bounds[1::2]):
+        kept = start + lttb(x[start:stop], v[start:stop], max(3, int(n_out * (stop - start) / finite.sum())))
+        xs += [x[kept], [np.nan]]
+        ys += [y[kept], [np.nan]]
+    return np.concatenate(xs[:-1]), np.concatenate(ys[:-1])
+
+def draw_figure(ax, spec, results_list, values, dpi=100):
+    """Draw one figure spec on a log-y axes: one line per results frame and column."""
+    n_out = spec['max_points']
+    if n_out == 'auto':
+        n_out = int(spec['figsize'][0] * dpi)
+    for results, value in zip(results_list, values):
+        x = _column(results, spec['x'])
+        for column in spec['columns']:
+            ax.plot(*decimate(x, _column(results, column), n_out), label=_series_label(spec, value, column),
+                    linewidth=spec['linewidth'])
+    # Final limits first, so the formatting below styles the ticks that end up drawn
+    ax.relim()
+    ax.autoscale_view()
+    if spec['xlim'] is not None:
+        ax.set_xlim(spec['xlim'])
+    if spec['ylim'] is not None:
+        ax.set_ylim(spec['ylim'])
+
+    if spec['scientific']:
+        # Set y-axis to use scientific notation for both major and minor ticks
+        formatter = ticker.ScalarFormatter(useMathText=True)
+        formatter.set_scientific(True)
+        formatter.set_powerlimits((0, 0))
+        ax.yaxis.set_major_formatter(formatter)
+        ax.yaxis.set_minor_formatter(formatter)
+        # Change the fontsize of the scientific notation exponent (10^-2)
+        ax.yaxis.get_offset_text().set_fontsize(TICK_LABEL_SIZE)
+    apply_plot_formatting(spec['x_label'], spec['y_label'], spec['title'], ax=ax)
+
+def plot_figure(spec, results_list, values, **changes):
+    """Interactive version of one figure spec: draw, save next to the others and show."""
+    spec = figure_spec(spec, **changes)
+    plt.figure(figsize=spec['figsize'])
+    ax = plt.gca()
+    ax.set_yscale('log')
+    style_axes(ax)
+    draw_figure(ax, spec, results_list, values, dpi=1000)
+    plt.savefig(f"{save_path}\\{spec['name']}.png", dpi=1000, bbox_inches='tight')
+    plt.show()
 
 def plot_multigamma(results_list, pressures, y_label='Recombination coefficient'):
-    plt.figure(figsize=(10, 6))
-    
-    for results, pressure in zip(results_list, pressures):
-        plt.semilogy(results['x'], results['gamma_OO'], label=f'gamma_OO, P={pressure} Pa', linewidth=1)
-        plt.semilogy(results['x'], results['gamma_NN'], label=f'gamma_NN, P={pressure} Pa', linewidth=1)
-        plt.semilogy(results['x'], results['gamma_ON'], label=f'gamma_ON, P={pressure} Pa', linewidth=1)
-        plt.semilogy(results['x'], results['gamma_NO'], label=f'gamma_NO, P={pressure} Pa', linewidth=1)
-
-    apply_plot_formatting(xlabel1, y_label)
-    plt.savefig(f'{save_path}\\multigamma.png', dpi=1000, bbox_inches='tight')
-    plt.show()
+    plot_figure('multigamma', results_list, pressures, y_label=y_label)
 
 def plot_gamma_OO(results_list, pressures, 
                   y_label='Recombination coefficient', 
                   title=None):
-    
-    plt.figure(figsize=(8, 6))
-    
-    for results, pressure in zip(results_list, pressures):
-        plt.semilogy(results['x'], results['gamma_OO'], label=f'Pressure: {pressure} Pa')
+    plot_figure('gamma_OO', results_list, pressures, y_label=y_label, title=title)
 
-    apply_plot_formatting(xlabel1, y_label, title)
+def plot_gamma_NN(results_list, pressures, y_label='Recombination coefficient'):
+    plot_figure('gamma_NN', results_list, pressures, y_label=y_label)
 
-    plt.xlim([0.3, 1])
-    plt.ylim([1e-3, 1e-1])
-    plt.savefig(f'{save_path}\\gamma_OO.png', dpi=1000, bbox_inches='tight')
-    plt.show()
+def plot_gamma_NO(results_list, pressures, y_label='Recombination coefficient'):
+    plot_figure('gamma_NO', results_list, pressures, y_label=y_label)
 
-def plot_residuals_single_point(results, T, P):
-    # Find the index of the specific temperature and pressure
-    index = None
-    for i in range(len(results['T'])):
-        if results['T'][i] == T and results['P'][i] == P:
-            index = i
-            break
-    
-    if index is None:
-        print(f"No results found for T={T} and P={P}")
-        return
+def plot_gamma_ON(results_list, pressures, y_label='Recombination coefficient'):
+    plot_figure('gamma_ON', results_list, pressures, y_label=y_label)
 
-    residuals = np.array(results['residuals'][index])
-    iterations = np.arange(len(residuals))  # Create an array of iterations
+def plot_gamma_OO_ratio(results_list, C0_values, y_label='Recombination coefficient'):
+    plot_figure('gamma_ratio', results_list, C0_values, y_label=y_label)
 
-    plt.plot(iterations, residuals, label=f'T={T} K, P={P} Pa')
-    apply_plot_formatting('Iteration', 'Residual')
+def plot_gamma_NN_ratio(results_list, C0_values, y_label='Recombination coefficient'):
+    plot_figure('gamma_ratio_NN', results_list, C0_values, y_label=y_label)
+
+def plot_gamma_NO_ratio(results_list, C0_values, y_label='Recombination coefficient'):
+    plot_figure('gamma_ratio_NO', results_list, C0_values, y_label=y_label)
+
+def plot_gamma_ON_ratio(results_list, C0_values, y_label='Recombination coefficient'):
+    plot_figure('gamma_ratio_ON', results_list, C0_values, y_label=y_label)
+
+def plot_residuals_single_point(results, T, P, diagnostics, C_O=None):
+    """
+    Convergence history of the point nearest to T, P (and C_O when results hold several).
+    :param diagnostics: ConvergenceDiagnostics from calculate(..., diagnostics=True) that produced results.
+    """
+    from results import ResultIndex
+    row = int(ResultIndex(results).locate(T, P, C_O, method='nearest'))
+    T_found, P_found = float(np.asarray(results['T'])[row]), float(np.asarray(results['P'])[row])
+    if (T_found, P_found) != (T, P):
+        print(f"No result at T={T} K, P={P} Pa, showing the nearest point T={T_found:g} K, P={P_found:g} Pa")
+
+    plot_convergence(diagnostics, [row], labels=[f'T={T_found:g} K, P={P_found:g} Pa'])
     plt.savefig(f'residuals_T{T}_P{P}.png', dpi=1000, bbox_inches='tight')
     plt.show()
 
-def plot_gamma_NN(results_list, pressures, y_label='Recombination coefficient'):
+def plot_convergence(diagnostics, rows=None, k=10, labels=None):
+    """
+    Scaled residual norm against iteration for some points, by default the k most expensive ones.
+    Points that went through fsolve show one entry per function evaluation.
+    """
+    if rows is None:
+        rows = np.argsort(-diagnostics.nfev, kind='stable')[:k]
+    if labels is None:
+        frame = diagnostics.to_dataframe()
+        labels = [f"T={frame['T'][i]:g} K, P={frame['P'][i]:g} Pa" if 'T' in frame else f'point {i}' for i in rows]
+
     plt.figure(figsize=(8, 6))
-    
-    for i, results in enumerate(results_list):
-        inverse_T = 1000 / results['T']
-        plt.semilogy(inverse_T, results['gamma_NN'], label=f'P={pressures[i]} Pa')
-    
-    apply_plot_formatting(xlabel1, y_label)
-    plt.xlim([0.25, 2])
-    plt.ylim([1e-4, 1e-1])
+    for history, label in zip(diagnostics.histories(rows), labels):
+        plt.semilogy(np.arange(history.size), np.maximum(history, 1e-300), marker='o', label=label)
+    apply_plot_formatting('Iteration', 'Scaled residual')
+
+def plot_gamma_band(uncertainty, output='gamma_OO', lower=0.05, upper=0.95, C_O_index=0,
+                    y_label='Recombination coefficient'):
+    """Median and lower-upper quantile band of gamma against 1000/T, one band per pressure."""
+    plt.figure(figsize=(8, 6))
+
+    inverse_T = 1000 / uncertainty.coords['T']
+    low, median, high = uncertainty.band(output, lower, upper)
+    for j, pressure in enumerate(uncertainty.coords['P']):
+        line, = plt.semilogy(inverse_T, median[:, j, C_O_index], label=f'P={pressure:g} Pa')
+        plt.fill_between(inverse_T, low[:, j, C_O_index], high[:, j, C_O_index], color=line.get_color(), alpha=0.25,
+                         linewidth=0)
 
-    plt.savefig(f'{save_path}\\gamma_NN.png', dpi=1000, bbox_inches='tight')
+    apply_plot_formatting(xlabel1, y_label)
+    plt.savefig(f'{save_path}\\{output}_band.png', dpi=1000, bbox_inches='tight')
     plt.show()
 
 def save_results_to_csv(results_list, pressures, filename_prefix='results'):
@@ -127,6 +340,14 @@ def save_results_to_csv(results_list, pressures, filename_prefix='results'):
         results.to_csv(filename, index=False)
         print(f"Results for P={pressure} Pa saved to {filename}")
 
+def save_results_to_store(results_list, path, param_file=None):
+    # One binary store for all results instead of one CSV per pressure; read back with result_store.open_store
+    from result_store import ResultStoreWriter
+    with ResultStoreWriter(path, param_file=param_file) as writer:
+        for results in results_list:
+            writer.append(results)
+    print(f"Results saved to {path}")
+
 def plot_gamma_OO_3d(results_list, pressures, y_label='Recombination coefficient'):
     fig = plt.figure()
     ax = fig.add_subplot(111, projection='3d')
@@ -144,167 +365,61 @@ def plot_gamma_OO_3d(results_list, pressures, y_label='Recombination coefficient
     plt.savefig(f'{save_path}\\gamma_OO_3d.png', dpi=1000, bbox_inches='tight')
     plt.show()
 
-def plot_gamma_NO(results_list, pressures, y_label='Recombination coefficient'):
-    plt.figure(figsize=(8, 6))
-    
-
-
-
-    for i, results in enumerate(results_list):
-        inverse_T = 1000 / results['T']
-        plt.semilogy(inverse_T, results['gamma_NO'], label=f'P={pressures[i]} Pa')
-    
-    apply_plot_formatting(xlabel1, y_label)
-    plt.xlim([0.3, 1.5])
-    plt.ylim([0.4e-2, 3e-2])
-
-
-   
-
-    # Set y-axis to use scientific notation for both major and minor ticks
-    ax = plt.gca()
-    formatter = ScalarFormatter(useMathText=True)
-    formatter.set_scientific(True)
-    formatter.set_powerlimits((0, 0))
-    ax.yaxis.set_major_formatter(formatter)
-    ax.yaxis.set_minor_formatter(formatter)   
-    #ax.yaxis.set_major_formatter(FormatStrFormatter('%.3f'))
-
-    # Change the fontsize of the scientific notation exponent (10^-2)
-    ax.yaxis.get_offset_text().set_fontsize(TICK_LABEL_SIZE)  # Adjust this size as needed
-    plt.tick_params(axis='y', which='both', labelsize=TICK_LABEL_SIZE)
-    plt.savefig(f'{save_path}\\gamma_NO.png', dpi=1000, bbox_inches='tight')
-    plt.show()
-
-def plot_gamma_ON(results_list, pressures, y_label='Recombination coefficient'):
-    plt.figure(figsize=(8, 6))
-    
-    for i, results in enumerate(results_list):
-        inverse_T = 1000 / results['T']
-        plt.semilogy(inverse_T, results['gamma_ON'], label=f'P={pressures[i]} Pa')
-    
-    apply_plot_formatting(xlabel1, y_label)
-    plt.xlim([0.3, 1])
-    plt.ylim([4e-4, 4e-3])
-    
-    # Set y-axis to use scientific notation for both major and minor ticks
-    ax = plt.gca()
-    formatter = ScalarFormatter(useMathText=True)
-    formatter.set_scientific(True)
-    formatter.set_powerlimits((0, 0))
-    ax.yaxis.set_major_formatter(formatter)
-    ax.yaxis.set_minor_formatter(formatter)   
-    # Set y-axis tick format to 1.0 instead of 1.00
-    #ax.yaxis.set_major_formatter(FormatStrFormatter('%.3f'))
-
-    # Change the fontsize of the scientific notation exponent (10^-2)
-    ax.yaxis.get_offset_text().set_fontsize(TICK_LABEL_SIZE)  # Adjust this size as needed
-    plt.tick_params(axis='y', which='both', labelsize=TICK_LABEL_SIZE)
-    
-    plt.savefig(f'{save_path}\\gamma_ON.png', dpi=1000, bbox_inches='tight')
-    plt.show()
-
-def plot_gamma_OO_ratio(results_list, C0_values, y_label='Recombination coefficient'):
-    plt.figure(figsize=(8, 6))
-    
-    for i, results in enumerate(results_list):
-        inverse_T = 1000 / results['T']
-
-        CO_ratio = C0_values[i] * 100
-        CN_ratio = (1 - C0_values[i]) * 100
-        divisor = math.gcd(int(CO_ratio), int(CN_ratio))
-        CO_simplified = CO_ratio / divisor
-        CN_simplified = CN_ratio / divisor
-
-        plt.semilogy(results['T'], 
-                     results['gamma_OO'], 
-                     label=f'C0:CN = {CO_simplified:.0f}:{CN_simplified:.0f}'
-                     )
-        
-    apply_plot_formatting(xlabel1, y_label)
-
-    plt.xlim([300, 5000])
-    plt.ylim([1e-4, 1e-1])
-      
-    
-    plt.savefig(f'{save_path}\\gamma_ratio.png', dpi=1000, bbox_inches='tight')
-    plt.show()
-
-
-def plot_gamma_NN_ratio(results_list, C0_values, y_label='Recombination coefficient'):
-    plt.figure(figsize=(8, 6))
-    
-    for i, results in enumerate(results_list):
-        inverse_T = 1000 / results['T']
-
-        CO_ratio = C0_values[i] * 100
-        CN_ratio = (1 - C0_values[i]) * 100
-        divisor = math.gcd(int(CO_ratio), int(CN_ratio))
-        CO_simplified = CO_ratio / divisor
-        CN_simplified = CN_ratio / divisor
-
-        plt.semilogy(results['T'], 
-                     results['gamma_NN'], 
-                     label=f'C0:CN = {CO_simplified:.0f}:{CN_simplified:.0f}'
-                     )
-        
-    apply_plot_formatting(xlabel1, y_label)
-
-    plt.xlim([300, 5000])
-    plt.ylim([1e-4, 1e-1])
-      
-    
-    plt.savefig(f'{save_path}\\gamma_ratio_NN.png', dpi=1000, bbox_inches='tight')
-    plt.show()
-
-def plot_gamma_NO_ratio(results_list, C0_values, y_label='Recombination coefficient'):
-    plt.figure(figsize=(8, 6))
-    
-    for i, results in enumerate(results_list):
-        inverse_T = 1000 / results['T']
-
-        CO_ratio = C0_values[i] * 100
-        CN_ratio = (1 - C0_values[i]) * 100
-        divisor = math.gcd(int(CO_ratio), int(CN_ratio))
-        CO_simplified = CO_ratio / divisor
-        CN_simplified = CN_ratio / divisor
-
-        plt.semilogy(results['T'], 
-                     results['gamma_NO'], 
-                     label=f'C0:CN = {CO_simplified:.0f}:{CN_simplified:.0f}'
-                     )
-        
-    apply_plot_formatting(xlabel1, y_label)
-
-    plt.xlim([300, 5000])
-    plt.ylim([1e-4, 1e-1])
-      
-    
-    plt.savefig(f'{save_path}\\gamma_ratio_NO.png', dpi=1000, bbox_inches='tight')
-    plt.show()
-
-def plot_gamma_ON_ratio(results_list, C0_values, y_label='Recombination coefficient'):
-    plt.figure(figsize=(8, 6))
-    
-    for i, results in enumerate(results_list):
-        inverse_T = 1000 / results['T']
-
-        CO_ratio = C0_values[i] * 100
-        CN_ratio = (1 - C0_values[i]) * 100
-        divisor = math.gcd(int(CO_ratio), int(CN_ratio))
-        CO_simplified = CO_ratio / divisor
-        CN_simplified = CN_ratio / divisor
-
-        plt.semilogy(results['T'], 
-                     results['gamma_ON'], 
-                     label=f'C0:CN = {CO_simplified:.0f}:{CN_simplified:.0f}'
-                     )
-        
-    apply_plot_formatting(xlabel1, y_label)
-
-    plt.xlim([300, 5000])
-    plt.ylim([1e-4, 1e-1])
-      
-    
-    plt.savefig(f'{save_path}\\gamma_ratio_ON.png', dpi=1000, bbox_inches='tight')
-    plt.show()
\ No newline at end of file
+def _setup_renderer(datasets, output_dir, fmt, dpi):
+    # A bare Figure renders through the Agg/vector canvases, so no GUI backend is ever touched;
+    # the styled axes is built once and reused by every figure of this worker
+    figure = mfigure.Figure()
+    ax = figure.add_subplot()
+    ax.set_yscale('log')
+    style_axes(ax)
+    return dict(datasets=datasets, output_dir=output_dir, fmt=fmt, dpi=dpi, figure=figure, ax=ax)
+
+def _render(spec):
+    w = worker_state
+    figure, ax = w['figure'], w['ax']
+    # Back to the template: drop the previous figure's artists and per-figure axis settings
+    for artist in list(ax.lines) + list(ax.collections):
+        artist.remove()
+    if ax.get_legend() is not None:
+        ax.get_legend().remove()
+    ax.set_prop_cycle(None)
+    ax.set_title('')
+    ax.set_yscale('log')
+    ax.set_autoscale_on(True)
+
+    results_list, values = w['datasets'][spec['series']]
+    draw_figure(ax, spec, results_list, values, dpi=w['dpi'])
+    figure.set_size_inches(spec['figsize'])
+    path = os.path.join(w['output_dir'], f"{spec['name']}.{w['fmt']}")
+    figure.savefig(path, dpi=w['dpi'], bbox_inches='tight', format=w['fmt'])
+    return path
+
+def _figure_data(results_list, specs):
+    # Only the columns the figures use travel to the workers
+    names = {'T'} | {spec['x'] for spec in specs} | {c for spec in specs for c in spec['columns']}
+    return [{name: _column(results, name) for name in names if name == 'x' or name in results}
+            for results in results_list]
+
+def render_figures(specs, datasets, output_dir=None, fmt='png', dpi=300, max_workers=None, mp_context=None):
+    """
+    Render a set of figures without a display, optionally on a process pool.
+    :param specs: Figure specs, names from GAMMA_FIGURES or dicts with the keys of FIGURE_DEFAULTS
+                  (plus 'name', the file name), e.g. list(GAMMA_FIGURES) for the full set.
+    :param datasets: {series: (results_list, values)}, e.g. {'pressure': (results_list, pressures),
+                     'composition': (results_list, C0_values)}; each spec draws the dataset of its 'series'.
+    :param fmt: 'png' (raster at dpi), or 'pdf' / 'svg' for vector output.
+    :param max_workers: Processes; 1 renders in this process.
+    :return: Paths of the written files, in the order of specs.
+    """
+    specs = [figure_spec(spec) for spec in specs]
+    output_dir = save_path if output_dir is None else output_dir
+    datasets = {series: (_figure_data(results_list, [s for s in specs if s['series'] == series]), list(values))
+                for series, (results_list, values) in datasets.items()
+                if any(s['series'] == series for s in specs)}
+    initargs = (datasets, output_dir, fmt, dpi)
+    max_workers = max_workers or min(len(specs), os.cpu_count() or 1)
+    if max_workers == 1:
+        init_worker(_setup_renderer, *initargs)
+        return [_render(spec) for spec in specs]
+    with worker_pool(max_workers, mp_context, _setup_renderer, initargs) as executor:
+        return list(executor.map(_render, specs))
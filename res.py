@@ -7,10 +7,12 @@ pressures = [10, 100, 1000]  # Example pressures in Pa
 param_file = 'test_para.py'  # Path to the parameter file
 
 results_list = []
+diagnostics_list = []
 
 for pressure in pressures:
-    results = calculate(temperatures, [pressure], param_file)
+    results, diagnostics = calculate(temperatures, [pressure], param_file, diagnostics=True)
     results_list.append(results)
+    diagnostics_list.append(diagnostics)
 
 # Print available temperature and pressure values
 for i, results in enumerate(results_list):
@@ -24,4 +26,4 @@ specific_P = 100  # Example specific pressure
 
 
 # Plot the residuals
-g.plot_residuals_single_point(results_list[1], specific_T, specific_P)
\ No newline at end of file
+g.plot_residuals_single_point(results_list[1], specific_T, specific_P, diagnostics_list[1])
\ No newline at end of file
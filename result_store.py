@@ -0,0 +1,179 @@
+import os
+import json
+import hashlib
+import datetime
+
+import numpy as np
+
+from parameters import load_parameters
+from solver import RESULT_COLUMNS
+from results import ResultIndex
+
+# A store is a directory with one raw little-endian float64 file per column
+# and a meta.json header; only the rows counted in the header are committed.
+FORMAT_VERSION = 1
+DTYPE = np.dtype("<f8")
+
+def _column_file(path, name):
+    return os.path.join(path, f"{name}.f8")
+
+def _write_meta(path, meta):
+    # Readers never see a half-written header
+    tmp = os.path.join(path, "meta.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp, os.path.join(path, "meta.json"))
+
+def _columns_of(results):
+    # Column arrays of a SweepResult, a result dictionary or a DataFrame
+    if hasattr(results, "block") and hasattr(results, "columns"):
+        return dict(zip(results.columns, results.block))
+    return {name: np.asarray(results[name]) for name in results.keys()}
+
+def parameter_provenance(param_file):
+    with open(param_file, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    values = {k: (v if isinstance(v, (int, float)) else repr(v)) for k, v in load_parameters(param_file).as_dict().items()}
+    return {"param_file": os.path.abspath(param_file), "param_sha256": digest, "parameters": values}
+
+class ResultStoreWriter:
+    """
+    Appends result chunks to a store while a sweep runs.
+    Every append is committed to the header, so readers can open the store at any time.
+    """
+
+    def __init__(self, path, columns=RESULT_COLUMNS, param_file=None, grid=None, attrs=None, mode="w"):
+        self.path = path
+        meta_file = os.path.join(path, "meta.json")
+        if mode == "a" and os.path.exists(meta_file):
+            with open(meta_file) as f:
+                self.meta = json.load(f)
+        elif mode in ("w", "a"):
+            os.makedirs(path, exist_ok=True)
+            self.meta = {
+                "format": FORMAT_VERSION,
+                "dtype": DTYPE.str,
+                "columns": list(columns),
+                "rows": 0,
+                "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            }
+            if param_file is not None:
+                self.meta.update(parameter_provenance(param_file))
+            if grid is not None:
+                self.meta["grid"] = {dim: np.asarray(axis, dtype=float).tolist() for dim, axis in grid.items()}
+            if attrs:
+                self.meta["attrs"] = attrs
+            for name in self.meta["columns"]:
+                open(_column_file(path, name), "wb").close()
+            _write_meta(path, self.meta)
+        else:
+            raise ValueError(f"Unknown mode: {mode}")
+        self._files = {name: open(_column_file(path, name), "r+b") for name in self.meta["columns"]}
+        for name, f in self._files.items():
+            # Drop anything past the committed rows, e.g. from an interrupted append
+            f.truncate(self.meta["rows"] * DTYPE.itemsize)
+            f.seek(0, os.SEEK_END)
+
+    def append(self, results):
+        """Append a SweepResult, a result dictionary or a DataFrame with the store's columns."""
+        columns = _columns_of(results)
+        missing = [name for name in self.meta["columns"] if name not in columns]
+        if missing:
+            raise KeyError(f"Chunk lacks columns: {', '.join(missing)}")
+        n = len(columns[self.meta["columns"][0]])
+        for name, f in self._files.items():
+            f.write(np.ascontiguousarray(columns[name], dtype=DTYPE).tobytes())
+            f.flush()
+        self.meta["rows"] += n
+        _write_meta(self.path, self.meta)
+        return n
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ResultStore:
+    """
+    Read-only view of a store. Columns are numpy memmaps, so slicing one reads only that part of the file.
+    Works wherever the plot_* functions expect results['x'], results['gamma_OO'], ...
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.columns = tuple(self.meta["columns"])
+        self.rows = self.meta["rows"]
+        self.grid = {dim: np.asarray(axis) for dim, axis in self.meta.get("grid", {}).items()}
+        self._index = None
+
+    def __getitem__(self, name):
+        if name not in self.columns:
+            raise KeyError(name)
+        if self.rows == 0:
+            return np.empty(0, dtype=DTYPE)
+        return np.memmap(_column_file(self.path, name), dtype=DTYPE, mode="r", shape=(self.rows,))
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __len__(self):
+        return self.rows
+
+    def keys(self):
+        return self.columns
+
+    def block(self, name):
+        """Column reshaped onto the grid recorded at creation, (T, P, C_O) order."""
+        shape = tuple(axis.size for axis in self.grid.values())
+        if not shape or int(np.prod(shape)) != self.rows:
+            raise ValueError("Store does not hold one complete grid")
+        return self[name].reshape(shape)
+
+    def where(self, **values):
+        """Rows whose coordinate columns equal the given values, e.g. where(P=1100), as column arrays."""
+        mask = np.ones(self.rows, dtype=bool)
+        for name, value in values.items():
+            mask &= np.isclose(self[name], value, rtol=1e-12, atol=0)
+        rows = np.flatnonzero(mask)
+        return _RowSelection(self, rows)
+
+    @property
+    def index(self):
+        """ResultIndex over the coordinate columns, built on first use."""
+        if self._index is None:
+            self._index = ResultIndex(self)
+        return self._index
+
+    def query(self, T, P, C_O=None, columns=None, method="exact"):
+        """Values of columns at arbitrary (T, P, C_O) points, see ResultIndex.query."""
+        return self.index.query(T, P, C_O, columns=columns, method=method)
+
+    def to_dataframe(self, columns=None):
+        import pandas as pd
+        return pd.DataFrame({name: self[name] for name in (columns or self.columns)})
+
+class _RowSelection:
+    # Lazily indexed subset of a store's rows
+    def __init__(self, store, rows):
+        self.store = store
+        self.rows = rows
+
+    def __getitem__(self, name):
+        return np.asarray(self.store[name][self.rows])
+
+    def __len__(self):
+        return self.rows.size
+
+    def keys(self):
+        return self.store.columns
+
+def open_store(path):
+    return ResultStore(path)
@@ -0,0 +1,238 @@
+import itertools
+
+import numpy as np
+
+class SweepResult:
+    """
+    Results on the grid T x P x C_O.
+    All columns live in one (n_columns, n_points) block; result[name] is an N-dimensional view of it.
+    """
+    dims = ("T", "P", "C_O")
+
+    def __init__(self, block, columns, coords):
+        self.block = block
+        self.columns = tuple(columns)
+        self.coords = {dim: np.atleast_1d(np.asarray(value, dtype=float)) for dim, value in zip(self.dims, coords)}
+        self.shape = tuple(value.size for value in self.coords.values())
+        if block.shape != (len(self.columns), int(np.prod(self.shape))):
+            raise ValueError(f"Block of shape {block.shape} does not match {len(self.columns)} columns on a {self.shape} grid")
+        self._index = None
+
+    def __getitem__(self, name):
+        return self.block[self.columns.index(name)].reshape(self.shape)
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __len__(self):
+        return self.block.shape[1]
+
+    def keys(self):
+        return self.columns
+
+    def __repr__(self):
+        sizes = ", ".join(f"{dim}: {size}" for dim, size in zip(self.dims, self.shape))
+        return f"SweepResult({sizes}; {len(self.columns)} columns)"
+
+    def isel(self, **indexers):
+        """Select by position along T, P or C_O. Integers keep the dimension with length one."""
+        index = []
+        for dim, size in zip(self.dims, self.shape):
+            i = indexers.pop(dim, slice(None))
+            if isinstance(i, (int, np.integer)):
+                i = range(size)[i]
+                i = slice(i, i + 1)
+            index.append(i)
+        if indexers:
+            raise KeyError(f"Unknown dimensions: {', '.join(indexers)}")
+
+        grid = self.block.reshape((len(self.columns),) + self.shape)
+        if all(isinstance(i, slice) for i in index):
+            part = grid[(slice(None),) + tuple(index)]
+        else:
+            index = [np.arange(size)[i] if isinstance(i, slice) else np.atleast_1d(i) for i, size in zip(index, self.shape)]
+            part = grid[(slice(None),) + np.ix_(*index)]
+        coords = [self.coords[dim][i] for dim, i in zip(self.dims, index)]
+        return SweepResult(np.ascontiguousarray(part).reshape(len(self.columns), -1), self.columns, coords)
+
+    def sel(self, **values):
+        """Select by coordinate value along T, P or C_O."""
+        indexers = {}
+        for dim, value in values.items():
+            if dim not in self.coords:
+                raise KeyError(f"Unknown dimension: {dim}")
+            axis = self.coords[dim]
+            wanted = np.atleast_1d(np.asarray(value, dtype=float))
+            matches = np.isclose(axis[None, :], wanted[:, None], rtol=1e-12, atol=0)
+            missing = ~matches.any(axis=1)
+            if missing.any():
+                raise KeyError(f"{dim} = {wanted[missing].tolist()} not on the grid")
+            positions = matches.argmax(axis=1)
+            indexers[dim] = int(positions[0]) if np.ndim(value) == 0 else positions
+        return self.isel(**indexers)
+
+    @property
+    def index(self):
+        """ResultIndex over the grid coordinates, built on first use."""
+        if self._index is None:
+            self._index = ResultIndex(self)
+        return self._index
+
+    def query(self, T, P, C_O=None, columns=None, method="exact"):
+        """Values of columns at arbitrary (T, P, C_O) points, see ResultIndex.query."""
+        return self.index.query(T, P, C_O, columns=columns, method=method)
+
+    def to_dataframe(self):
+        """Long-format view, one row per grid point; no copy of the result columns."""
+        import pandas as pd
+        return pd.DataFrame(self.block.T, columns=list(self.columns), copy=False)
+
+    def frames(self, dim):
+        """One DataFrame per coordinate value along dim, as the plot_* functions expect."""
+        return [self.isel(**{dim: i}).to_dataframe() for i in range(self.coords[dim].size)]
+
+# Coordinates in which distances and interpolation are measured: 1000/T and log10(P), as plotted
+_TRANSFORMS = {"T": lambda v: 1000 / v, "P": np.log10, "C_O": lambda v: v}
+
+class ResultIndex:
+    """
+    Lookup of result rows by their (T, P, C_O) coordinates.
+    Rows that form a complete grid (a SweepResult, or any flat result set of one in any row order)
+    are found by a binary search per axis; other row sets go through a k-d tree. Either way a query
+    costs O(log n) per point, and all query points are answered in one vectorized call.
+    Distances and interpolation weights are measured in 1000/T, log10(P) and C_O.
+    """
+
+    def __init__(self, results):
+        self.results = results
+        if isinstance(results, SweepResult):
+            self._column = lambda name: results.block[results.columns.index(name)]
+            self.columns = results.columns
+            axes = [results.coords[dim] for dim in SweepResult.dims]
+            self.rows = None
+        else:
+            self._column = lambda name: np.asarray(results[name]).ravel()
+            self.columns = tuple(results.keys())
+            values = [self._coordinate(dim) for dim in SweepResult.dims]
+            axes = [np.unique(v) for v in values]
+            self.rows = self._grid_rows(values, axes)
+            if self.rows is None:
+                self._points = values
+        self.axes = dict(zip(SweepResult.dims, axes))
+        self.shape = tuple(axis.size for axis in axes)
+        if self.is_grid:
+            self._order = {dim: np.argsort(axis, kind="stable") for dim, axis in self.axes.items()}
+            self._sorted = {dim: axis[self._order[dim]] for dim, axis in self.axes.items()}
+        else:
+            self._build_tree()
+
+    @staticmethod
+    def _grid_rows(values, axes):
+        # Row of every grid position when the rows cover the product of the axes exactly once, else None
+        shape = tuple(axis.size for axis in axes)
+        if int(np.prod(shape)) != values[0].size:
+            return None
+        positions = np.ravel_multi_index([np.searchsorted(axis, v) for axis, v in zip(axes, values)], shape)
+        rows = np.full(positions.size, -1)
+        rows[positions] = np.arange(positions.size)
+        return rows if (rows >= 0).all() else None
+
+    def _build_tree(self):
+        from scipy.spatial import cKDTree
+        coords = [_TRANSFORMS[dim](v) for dim, v in zip(SweepResult.dims, self._points)]
+        self._scale = np.array([np.ptp(c) or 1.0 for c in coords])
+        self._tree = cKDTree(np.column_stack(coords) / self._scale)
+
+    @property
+    def is_grid(self):
+        return not hasattr(self, "_points")
+
+    def __len__(self):
+        return int(np.prod(self.shape)) if self.is_grid else self._points[0].size
+
+    def _query_points(self, T, P, C_O):
+        if C_O is None:
+            if self.axes["C_O"].size > 1:
+                raise ValueError("C_O is required, the results hold more than one composition")
+            C_O = self.axes["C_O"][0]
+        return np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (T, P, C_O)))
+
+    def _axis_neighbours(self, dim, q):
+        # Positions on the original axis of the sorted neighbours below and above q, and q's fraction between them
+        axis, order = self._sorted[dim], self._order[dim]
+        if axis.size == 1:
+            zero = np.zeros(q.shape, dtype=int)
+            return order[zero], order[zero], np.zeros(q.shape)
+        hi = np.clip(np.searchsorted(axis, q), 1, axis.size - 1)
+        lo = hi - 1
+        t = _TRANSFORMS[dim]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            w = (t(q) - t(axis[lo])) / (t(axis[hi]) - t(axis[lo]))
+        return order[lo], order[hi], w
+
+    def _grid_row(self, positions):
+        flat = np.ravel_multi_index(positions, self.shape)
+        return flat if self.rows is None else self.rows[flat]
+
+    def locate(self, T, P, C_O=None, method="exact", rtol=1e-9):
+        """
+        Row numbers of query points, shaped like the broadcast query.
+        :param method: 'exact' (KeyError for points not in the results, within rtol per coordinate)
+                       or 'nearest'.
+        """
+        query = self._query_points(T, P, C_O)
+        if self.is_grid:
+            positions = []
+            for dim, q in zip(SweepResult.dims, query):
+                lo, hi, w = self._axis_neighbours(dim, q)
+                positions.append(np.where(w > 0.5, hi, lo))
+            rows = self._grid_row(positions)
+        else:
+            coords = np.stack([_TRANSFORMS[dim](q) for dim, q in zip(SweepResult.dims, query)], axis=-1)
+            rows = self._tree.query(coords / self._scale)[1]
+        if method == "exact":
+            found = np.ones(rows.shape, dtype=bool)
+            for dim, q in zip(SweepResult.dims, query):
+                found &= np.isclose(self._coordinate(dim)[rows], q, rtol=rtol, atol=0)
+            if not found.all():
+                missing = np.column_stack([q[~found] for q in query])[:5]
+                raise KeyError(f"(T, P, C_O) = {missing.tolist()} not in the results")
+        elif method != "nearest":
+            raise ValueError(f"Unknown method: {method}")
+        return rows
+
+    def _coordinate(self, dim):
+        # Coordinate of every row; flat results without a C_O column hold one composition
+        if dim in self.columns:
+            return self._column(dim)
+        return np.zeros(self._column("T").size)
+
+    def query(self, T, P, C_O=None, columns=None, method="exact", rtol=1e-9):
+        """
+        Values of result columns at query points.
+        :param method: 'exact', 'nearest' or 'linear' (multilinear in 1000/T, log10(P) and C_O between
+                       the surrounding grid points; grid results only, and within the grid).
+        :return: Dictionary {column: array shaped like the broadcast query}.
+        """
+        columns = list(self.columns) if columns is None else list(columns)
+        if method != "linear":
+            rows = self.locate(T, P, C_O, method=method, rtol=rtol)
+            return {name: self._column(name)[rows] for name in columns}
+        if not self.is_grid:
+            raise ValueError("Linear interpolation needs results on a complete grid")
+
+        query = self._query_points(T, P, C_O)
+        corners = []
+        for dim, q in zip(SweepResult.dims, query):
+            lo, hi, w = self._axis_neighbours(dim, q)
+            if self.axes[dim].size > 1 and not ((w >= -1e-12) & (w <= 1 + 1e-12)).all():
+                raise ValueError(f"{dim} outside the grid, {self.axes[dim].min():g} to {self.axes[dim].max():g}")
+            corners.append(((lo, 1 - w), (hi, w)))
+        out = {name: np.zeros(query[0].shape) for name in columns}
+        for (iT, wT), (iP, wP), (iC, wC) in itertools.product(*corners):
+            weight = wT * wP * wC
+            rows = self._grid_row((iT, iP, iC))
+            for name in columns:
+                # Corners with zero weight must not turn the result into NaN
+                out[name] += np.where(weight != 0, weight * self._column(name)[rows], 0.0)
+        return out
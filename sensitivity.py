@@ -0,0 +1,64 @@
+import numpy as np
+
+from parameters import PARAMETER_NAMES
+from solver import rate_coefficients, balance, jacobian, reaction_rates, recombination_coefficients
+
+# Physical constants are not kinetic parameters
+SENSITIVITY_PARAMETERS = tuple(name for name in PARAMETER_NAMES if name not in ("kB", "Na", "h"))
+SENSITIVITY_OUTPUTS = ("theta_O", "theta_N", "gamma_OO", "gamma_NN", "gamma_ON", "gamma_NO")
+
+# Complex-step size relative to the parameter value; there is no subtractive cancellation,
+# so it can be far below the square root of the machine epsilon
+STEP = 1e-30
+
+def parameter_sensitivities(params, results, names=None, relative=False, derive=False):
+    """
+    Derivatives of the coverages and recombination coefficients with respect to the kinetic parameters
+    at converged steady states, from the implicit function theorem: dtheta/dk = -J^-1 dF/dk.
+    dF/dk and the total dgamma/dk come from complex steps, all points and parameters at once.
+    :param results: Converged results with the columns T, P, C_O, theta_O and theta_N.
+    :param names: Parameters to differentiate by, default SENSITIVITY_PARAMETERS.
+    :param relative: Return the logarithmic sensitivities dln(y)/dln(k) instead of dy/dk.
+    :param derive: Perturb through Parameters.derive, so Q_lh* follow Em_*, D_* and Qa_* as in a parameter file.
+    :return: Dictionary of columns named 'd<output>/d<parameter>', e.g. 'dgamma_OO/dQ_erOO'.
+    """
+    names = SENSITIVITY_PARAMETERS if names is None else tuple(names)
+    T, P, C_O, theta_O, theta_N = (np.asarray(results[name], dtype=float)
+                                   for name in ("T", "P", "C_O", "theta_O", "theta_N"))
+    n = T.size
+    coeffs = rate_coefficients(params, T, P, C_O)
+    j11, j12, j21, j22 = jacobian(theta_O, theta_N, coeffs)
+    det = j11 * j22 - j12 * j21
+
+    # One row per parameter of the single (n_parameters * n_outputs, n) block
+    block = np.empty((len(names) * len(SENSITIVITY_OUTPUTS), n))
+    out = {}
+    rows = iter(block)
+    for name in names:
+        value = getattr(params, name)
+        if value is None:
+            raise ValueError(f"Parameter {name} is not set")
+        h = STEP * max(abs(value), 1.0)
+        perturb = params.derive if derive else params.replace
+        perturbed = perturb(**{name: value + 1j * h})
+        c = rate_coefficients(perturbed, T, P, C_O)
+
+        dF1, dF2 = (np.imag(eq) / h for eq in balance(theta_O, theta_N, c))
+        dtheta_O = -(dF1 * j22 - dF2 * j12) / det
+        dtheta_N = -(dF2 * j11 - dF1 * j21) / det
+
+        # Moving the coverages along their sensitivities gives the total derivative of gamma
+        a = theta_O + 1j * h * dtheta_O
+        b = theta_N + 1j * h * dtheta_N
+        gamma = recombination_coefficients(reaction_rates(a, b, c), c)
+
+        values = {"theta_O": dtheta_O, "theta_N": dtheta_N}
+        values.update({key: np.imag(g) / h for key, g in gamma.items()})
+        for output in SENSITIVITY_OUTPUTS:
+            row = next(rows)
+            row[:] = values[output]
+            if relative:
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    row *= value / np.asarray(results[output], dtype=float)
+            out[f"d{output}/d{name}"] = row
+    return out
@@ -1,151 +1,792 @@
+import functools
 import numpy as np
-from scipy.optimize import fsolve
-import pandas as pd
-import importlib.util
+from parameters import load_parameters
+from results import SweepResult
+from point_cache import PointCache
+from diagnostics import ConvergenceDiagnostics, CONVERGED, FALLBACK, ROBUST, FAILED
 
-def load_parameters(param_file):
-    spec = importlib.util.spec_from_file_location("params", param_file)
-    params = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(params)
-    return params
+def temperature_factors(params, T):
+    """
+    Kinetic factors that depend on the temperature only, evaluated element-wise.
+    :return: Dictionary of arrays shaped like T.
+    """
+    T = np.asarray(T, dtype=float)
+    sqrt_T = np.sqrt(T)
 
-def calculate(temperatures, pressures, param_file, C_O=10/11):
-    
+    # LH
+    v_O = params.nu_O * sqrt_T
+    v_N = params.nu_N * sqrt_T
 
-    
-    # Load parameters from the specified file
-    params = load_parameters(param_file)
+    return {
+        # Flux of hitting surface per Pa of partial pressure
+        "n_O_per_Pa": 1 / (params.flux_O * sqrt_T),
+        "n_N_per_Pa": 1 / (params.flux_N * sqrt_T),
+        # ER
+        "gamma_star_OO": params.P_erOO * np.exp(-params.T_erOO / T),
+        "gamma_star_NN": params.P_erNN * np.exp(-params.T_erNN / T),
+        "gamma_star_ON": params.P_erON * np.exp(-params.T_erON / T),
+        "gamma_star_NO": params.P_erNO * np.exp(-params.T_erNO / T),
+        # LH, per theta^2 or theta_O * theta_N
+        "k_LH_OO": 2.0 * v_O * params.nsite * np.exp(-params.T_lhOO / T),
+        "k_LH_NN": 2.0 * v_N * params.nsite * np.exp(-params.T_lhNN / T),
+        "k_LH_NO": (v_O + v_N) * params.nsite * np.exp(-params.T_lhNO / T),
+        # Desorption, per theta
+        "k_des_O": params.k_des * T * np.exp(-params.T_aO / T),
+        "k_des_N": params.k_des * T * np.exp(-params.T_aN / T),
+        # OH
+        "theta_OH": params.AA * (1.0 - np.exp(-params.T_OH / T)),
+    }
+
+# Largest temperature axis kept in the rate table cache, which bounds it to a few MB
+RATE_CACHE_MAX_TEMPERATURES = 4096
+
+@functools.lru_cache(maxsize=32)
+def _cached_rate_table(params, temperatures):
+    table = temperature_factors(params, np.frombuffer(temperatures))
+    for value in table.values():
+        value.flags.writeable = False
+    return table
 
-        # Use CO and CN from function arguments if provided, otherwise use from params
-    C_O = C_O if C_O is not None else getattr(params, 'C0', 10 / 11)
+def rate_table(params, T, cache=False):
+    """
+    temperature_factors evaluated once per unique temperature and mapped back onto T.
+    :param cache: Keep the table of the unique temperatures in an LRU cache, keyed by the parameter set and
+                  the exact temperatures. Only worth it for a temperature axis that recurs, e.g. the one of a grid;
+                  axes longer than RATE_CACHE_MAX_TEMPERATURES are never cached.
+    """
+    T = np.asarray(T, dtype=float)
+    unique, inverse = np.unique(T, return_inverse=True)
+    if cache and unique.size <= RATE_CACHE_MAX_TEMPERATURES:
+        table = _cached_rate_table(params, unique.tobytes())
+    else:
+        table = temperature_factors(params, unique)
+    # Parameters holding arrays (a batch of parameter sets) add leading axes to the table
+    if T.size == unique.size and np.array_equal(unique, T.ravel()):
+        return {name: value.reshape(value.shape[:-1] + T.shape) for name, value in table.items()}
+    return {name: value[..., inverse.ravel()].reshape(value.shape[:-1] + T.shape) for name, value in table.items()}
+
+def clear_rate_cache():
+    _cached_rate_table.cache_clear()
+
+def rate_coefficients(params, T, p, C_O, cache=False):
+    """
+    Rate coefficients of the O/N coverage balance, evaluated element-wise.
+    The temperature-only factors come from rate_table, so pass T with as few distinct
+    values as possible, e.g. shaped (n_T, 1, 1) against a (n_T, n_P, n_C) grid.
+    :param T, p, C_O: Arrays (or scalars) broadcastable against each other.
+    :param cache: See rate_table.
+    :return: Dictionary of coefficient arrays.
+    """
+    p = np.asarray(p, dtype=float)
     C_N = 1 - C_O
 
-    # Initialize a dictionary to store the results
-    res_dict = {
-        "theta_O": [],
-        "theta_N": [],
-        "T": [],
-        "P": [],
-        "x": [],
-        "gamma_OO": [],
-        "gamma_NN": [],
-        "gamma_ON": [],
-        "gamma_NO": [],
-        "omega_ad_O": [],
-        "omega_ad_N": [],
-        "omega_ER_OO": [],
-        "omega_ER_NN": [],
-        "omega_ER_ON": [],
-        "omega_ER_NO": [],
-        "omega_LH_OO": [],
-        "omega_LH_NN": [],
-        "omega_LH_NO": [],
-        "omega_des_O": [],
-        "omega_des_N": [],
-        "residuals": []  # Add a new key for residuals
+    # partial pressure
+    p_O = p * C_O
+    p_N = p * C_N
+
+    coeffs = rate_table(params, T, cache=cache)
+    coeffs["n_O"] = p_O * coeffs.pop("n_O_per_Pa")
+    coeffs["n_N"] = p_N * coeffs.pop("n_N_per_Pa")
+    coeffs["s_O"] = params.s_O
+    coeffs["s_N"] = params.s_N
+    return coeffs
+
+def reaction_rates(theta_O, theta_N, coeffs):
+    c = coeffs
+    free = 1 - theta_O - theta_N - c["theta_OH"]
+    return {
+        "omega_ad_O": c["s_O"] * free * c["n_O"],
+        "omega_ad_N": c["s_N"] * free * c["n_N"],
+        "omega_ER_OO": c["gamma_star_OO"] * theta_O * c["n_O"],
+        "omega_ER_NN": c["gamma_star_NN"] * theta_N * c["n_N"],
+        "omega_ER_ON": c["gamma_star_ON"] * theta_N * c["n_O"],
+        "omega_ER_NO": c["gamma_star_NO"] * theta_O * c["n_N"],
+        "omega_LH_OO": c["k_LH_OO"] * theta_O**2,
+        "omega_LH_NN": c["k_LH_NN"] * theta_N**2,
+        "omega_LH_NO": c["k_LH_NO"] * theta_N * theta_O,
+        "omega_des_O": c["k_des_O"] * theta_O,
+        "omega_des_N": c["k_des_N"] * theta_N,
+    }
+
+def recombination_coefficients(omega, coeffs):
+    return {
+        "gamma_OO": (omega["omega_LH_OO"] + 2 * omega["omega_ER_OO"]) / coeffs["n_O"],
+        "gamma_NN": (omega["omega_LH_NN"] + 2 * omega["omega_ER_NN"]) / coeffs["n_N"],
+        "gamma_ON": (omega["omega_LH_NO"] + omega["omega_ER_NO"] + omega["omega_ER_ON"]) / coeffs["n_O"],
+        "gamma_NO": (omega["omega_LH_NO"] + omega["omega_ER_NO"] + omega["omega_ER_ON"]) / coeffs["n_N"],
     }
 
-    # Main Loop
-    for T in temperatures:
-        for p in pressures:
-            x = 1000 / T  # invT
-
-            # partial pressure
-            p_O = p * C_O
-            p_N = p * C_N
-
-            # Flux of hitting surface
-            n_O = p_O / (np.sqrt(2 * np.pi * params.mass_O * params.kB * T))  
-            n_N = p_N / (np.sqrt(2 * np.pi * params.mass_N * params.kB * T))
-
-            # ER
-            gamma_star_OO = params.P_erOO * np.exp(-params.Q_erOO / (params.kB * T))
-            gamma_star_NN = params.P_erNN * np.exp(-params.Q_erNN / (params.kB * T))
-            gamma_star_ON = params.P_erON * np.exp(-params.Q_erON / (params.kB * T))
-            gamma_star_NO = params.P_erNO * np.exp(-params.Q_erNO / (params.kB * T))
-
-            # LH
-            v_O = (params.cA / params.delta) * np.sqrt(np.pi * params.kB * T / (2 * params.mass_O))
-            v_N = (params.cA / params.delta) * np.sqrt(np.pi * params.kB * T / (2 * params.mass_N))
-
-            # OH
-            theta_OH = params.AA * (1.0 - np.exp(-params.E_OH / params.Na / T))
-
-            # Reaction Functions
-            omega_ad_O = lambda theta_O, theta_N: params.s_O * (1 - theta_O - theta_N - theta_OH) * n_O
-            omega_ad_N = lambda theta_O, theta_N: params.s_N * (1 - theta_O - theta_N - theta_OH) * n_N
-
-            omega_ER_OO = lambda theta_O: 1 * gamma_star_OO * theta_O * n_O
-            omega_ER_NN = lambda theta_N: 1 * gamma_star_NN * theta_N * n_N
-            omega_ER_ON = lambda theta_N: 1 * gamma_star_ON * theta_N * n_O
-            omega_ER_NO = lambda theta_O: 1 * gamma_star_NO * theta_O * n_N
-
-            omega_LH_OO = lambda theta_O: 2.0 * v_O * params.nsite * theta_O**2 * np.exp(-params.Q_lhOO / (params.kB * T))
-            omega_LH_NN = lambda theta_N: 2.0 * v_N * params.nsite * theta_N**2 * np.exp(-params.Q_lhNN / (params.kB * T))
-            omega_LH_NO = lambda theta_O, theta_N: (v_O + v_N) * params.nsite * theta_N * theta_O * np.exp(-params.Q_lhNO / (params.kB * T))
-
-            omega_des_O = lambda theta_O: 1 * params.nsite * theta_O * (params.kB * T / params.h) * np.exp(-params.Qa_O / (params.kB * T))
-            omega_des_N = lambda theta_N: 1 * params.nsite * theta_N * (params.kB * T / params.h) * np.exp(-params.Qa_N / (params.kB * T))
-
-            # Steady State Equations
-            def SysEqs(initial_guess):
-                theta_O, theta_N = initial_guess
-                eq1 = omega_ad_O(theta_O, theta_N) - omega_ER_OO(theta_O) - omega_ER_NO(theta_O) - omega_LH_NO(theta_O, theta_N) - omega_LH_OO(theta_O) - omega_des_O(theta_O)
-                eq2 = omega_ad_N(theta_O, theta_N) - omega_ER_NN(theta_N) - omega_ER_ON(theta_N) - omega_LH_NO(theta_O, theta_N) - omega_LH_NN(theta_N) - omega_des_N(theta_N)
-                return [eq1, eq2]
-
-            # Solve the system of equations
-            initial_guess = [0.5, 0.5]
-            theta, infodict, ier, msg = fsolve(SysEqs, initial_guess, full_output=True)
-
-            # Post-processing with final theta values
-            theta_O, theta_N = theta[0], theta[1]
-
-            # Calculate omega values based on theta
-            omega_ad_O_val = omega_ad_O(theta_O, theta_N)
-            omega_ad_N_val = omega_ad_N(theta_O, theta_N)
-
-            omega_ER_OO_val = omega_ER_OO(theta_O)
-            omega_ER_NN_val = omega_ER_NN(theta_N)
-            omega_ER_ON_val = omega_ER_ON(theta_N)
-            omega_ER_NO_val = omega_ER_NO(theta_O)
-
-            omega_LH_OO_val = omega_LH_OO(theta_O)
-            omega_LH_NN_val = omega_LH_NN(theta_N)
-            omega_LH_NO_val = omega_LH_NO(theta_O, theta_N)
-
-            omega_des_O_val = omega_des_O(theta_O)
-            omega_des_N_val = omega_des_N(theta_N)
-
-            # Calculate gamma values based on omega
-            gamma_OO = (omega_LH_OO_val + 2 * omega_ER_OO_val) / n_O
-            gamma_NN = (omega_LH_NN_val + 2 * omega_ER_NN_val) / n_N
-            gamma_ON = (omega_LH_NO_val + omega_ER_NO_val + omega_ER_ON_val) / n_O
-            gamma_NO = (omega_LH_NO_val + omega_ER_NO_val + omega_ER_ON_val) / n_N
-
-            # Append results to the dictionary
-            res_dict["theta_O"].append(theta_O)
-            res_dict["theta_N"].append(theta_N)
-            res_dict["T"].append(T)
-            res_dict["P"].append(p)
-            res_dict["x"].append(x)
-            res_dict["gamma_OO"].append(gamma_OO)
-            res_dict["gamma_NN"].append(gamma_NN)
-            res_dict["gamma_ON"].append(gamma_ON)
-            res_dict["gamma_NO"].append(gamma_NO)
-            res_dict["omega_ad_O"].append(omega_ad_O_val)
-            res_dict["omega_ad_N"].append(omega_ad_N_val)
-            res_dict["omega_ER_OO"].append(omega_ER_OO_val)
-            res_dict["omega_ER_NN"].append(omega_ER_NN_val)
-            res_dict["omega_ER_ON"].append(omega_ER_ON_val)
-            res_dict["omega_ER_NO"].append(omega_ER_NO_val)
-            res_dict["omega_LH_OO"].append(omega_LH_OO_val)
-            res_dict["omega_LH_NN"].append(omega_LH_NN_val)
-            res_dict["omega_LH_NO"].append(omega_LH_NO_val)
-            res_dict["omega_des_O"].append(omega_des_O_val)
-            res_dict["omega_des_N"].append(omega_des_N_val)
-            res_dict["residuals"].append(infodict['fvec'])  # Store the residuals
-
-    # Convert the dictionary to a pandas DataFrame
-    res_df = pd.DataFrame(res_dict)
-    return res_df
\ No newline at end of file
+# Steady State Equations
+def balance(theta_O, theta_N, coeffs):
+    c = coeffs
+    free = 1 - theta_O - theta_N - c["theta_OH"]
+    LH_NO = c["k_LH_NO"] * theta_N * theta_O
+    eq1 = (c["s_O"] * free * c["n_O"] - c["gamma_star_OO"] * theta_O * c["n_O"] - c["gamma_star_NO"] * theta_O * c["n_N"]
+           - LH_NO - c["k_LH_OO"] * theta_O**2 - c["k_des_O"] * theta_O)
+    eq2 = (c["s_N"] * free * c["n_N"] - c["gamma_star_NN"] * theta_N * c["n_N"] - c["gamma_star_ON"] * theta_N * c["n_O"]
+           - LH_NO - c["k_LH_NN"] * theta_N**2 - c["k_des_N"] * theta_N)
+    return eq1, eq2
+
+def jacobian(theta_O, theta_N, coeffs):
+    c = coeffs
+    ad_O = c["s_O"] * c["n_O"]
+    ad_N = c["s_N"] * c["n_N"]
+    j11 = (-ad_O - c["gamma_star_OO"] * c["n_O"] - c["gamma_star_NO"] * c["n_N"]
+           - c["k_LH_NO"] * theta_N - 2 * c["k_LH_OO"] * theta_O - c["k_des_O"])
+    j12 = -ad_O - c["k_LH_NO"] * theta_O
+    j21 = -ad_N - c["k_LH_NO"] * theta_N
+    j22 = (-ad_N - c["gamma_star_NN"] * c["n_N"] - c["gamma_star_ON"] * c["n_O"]
+           - c["k_LH_NO"] * theta_O - 2 * c["k_LH_NN"] * theta_N - c["k_des_N"])
+    return j11, j12, j21, j22
+
+def _balance_scale(coeffs):
+    # Adsorption flux onto a bare surface, used to make the residuals dimensionless
+    scale = coeffs["s_O"] * coeffs["n_O"] + coeffs["s_N"] * coeffs["n_N"]
+    return np.where(scale > 0, scale, 1.0)
+
+def _take(coeffs, idx):
+    return {k: (v[idx] if np.ndim(v) else v) for k, v in coeffs.items()}
+
+def newton_solve(coeffs, theta_O, theta_N, xtol=1.49012e-08, ftol=1e-10, maxiter=50, max_halvings=30,
+                 diagnostics=None, rows=None):
+    """
+    Damped Newton iteration on the coverage balance for a whole batch of points.
+    :param coeffs: Output of rate_coefficients, all arrays of the same shape (n,).
+    :param theta_O, theta_N: Initial guesses, arrays of shape (n,).
+    :param diagnostics: ConvergenceDiagnostics to record iterations, evaluations and residuals in.
+    :param rows: Rows of the points in diagnostics, default 0..n-1.
+    :return: (theta_O, theta_N, converged)
+    """
+    theta_O = np.array(theta_O, dtype=float)
+    theta_N = np.array(theta_N, dtype=float)
+    n = theta_O.size
+    converged = np.zeros(n, dtype=bool)
+    scale = _balance_scale(coeffs)
+
+    idx = np.arange(n)
+    c, s = coeffs, scale
+    a, b = theta_O, theta_N
+    f1, f2 = balance(a, b, c)
+    if diagnostics is not None:
+        rows = np.arange(n) if rows is None else np.asarray(rows)
+        diagnostics.nfev[rows] += 1
+        diagnostics.log_residual(rows, np.maximum(np.abs(f1), np.abs(f2)) / s)
+    for _ in range(maxiter):
+        j11, j12, j21, j22 = jacobian(a, b, c)
+        det = j11 * j22 - j12 * j21
+        da = (-f1 * j22 + f2 * j12) / det
+        db = (-f2 * j11 + f1 * j21) / det
+
+        # Backtracking on the scaled residual norm; below the rounding floor any step is accepted
+        merit = np.maximum((f1 / s)**2 + (f2 / s)**2, (1e-2 * ftol)**2)
+        lam = np.ones_like(a)
+        for trials in range(1, max_halvings + 1):
+            g1, g2 = balance(a + lam * da, b + lam * db, c)
+            reject = ~(((g1 / s)**2 + (g2 / s)**2) <= (1 - 1e-4 * lam) * merit)
+            if not reject.any():
+                break
+            lam = np.where(reject, 0.5 * lam, lam)
+        else:
+            g1 = None
+
+        a = a + lam * da
+        b = b + lam * db
+        theta_O[idx] = a
+        theta_N[idx] = b
+
+        step = np.maximum(np.abs(lam * da), np.abs(lam * db))
+        # The last trial already holds the residual at the accepted step, unless backtracking ran out
+        f1, f2 = (g1, g2) if g1 is not None else balance(a, b, c)
+        res = np.maximum(np.abs(f1), np.abs(f2)) / s
+        if diagnostics is not None:
+            diagnostics.log_iteration(rows[idx], trials + (g1 is None))
+            diagnostics.log_residual(rows[idx], res)
+        done = (step <= xtol * np.maximum(np.abs(a) + np.abs(b), xtol)) & (res <= ftol)
+        done |= res == 0
+        converged[idx[done]] = True
+
+        keep = ~done & np.isfinite(a) & np.isfinite(b)
+        if not keep.any():
+            break
+        idx, a, b, s, f1, f2 = idx[keep], a[keep], b[keep], s[keep], f1[keep], f2[keep]
+        c = _take(c, keep)
+
+    return theta_O, theta_N, converged
+
+def _polymul(p, q):
+    # Product of batched polynomials, coefficients in ascending order along the last axis
+    out = np.zeros(np.broadcast_shapes(p.shape[:-1], q.shape[:-1]) + (p.shape[-1] + q.shape[-1] - 1,))
+    for i in range(p.shape[-1]):
+        out[..., i:i + q.shape[-1]] += p[..., i:i + 1] * q
+    return out
+
+def _polyadd(*polys):
+    width = max(p.shape[-1] for p in polys)
+    out = 0
+    for p in polys:
+        out = out + np.concatenate([p, np.zeros(p.shape[:-1] + (width - p.shape[-1],))], axis=-1)
+    return out
+
+def _reduced_coefficients(coeffs):
+    # eq1 = A1 (s - a - b) - B1 a - C a b - D1 a**2, eq2 = A2 (s - a - b) - B2 b - C a b - D2 b**2
+    c = coeffs
+    A1 = c["s_O"] * c["n_O"]
+    A2 = c["s_N"] * c["n_N"]
+    B1 = c["gamma_star_OO"] * c["n_O"] + c["gamma_star_NO"] * c["n_N"] + c["k_des_O"]
+    B2 = c["gamma_star_NN"] * c["n_N"] + c["gamma_star_ON"] * c["n_O"] + c["k_des_N"]
+    C, D1, D2 = c["k_LH_NO"], c["k_LH_OO"], c["k_LH_NN"]
+    return np.broadcast_arrays(A1, A2, B1, B2, C, D1, D2, 1 - c["theta_OH"])
+
+def quartic_coefficients(coeffs):
+    """
+    Quartic in theta_O left after eliminating theta_N from the steady state equations.
+    eq1 is linear in theta_N, so theta_N = N(theta_O) / D(theta_O) with N quadratic and D linear;
+    substituting into eq2 and clearing D**2 gives the quartic.
+    :return: (quartic, N, D), coefficients in ascending order along the last axis.
+    """
+    A1, A2, B1, B2, C, D1, D2, s = _reduced_coefficients(coeffs)
+    zero = np.zeros_like(A1)
+
+    N = np.stack([A1 * s, -(A1 + B1), -D1], axis=-1)
+    D = np.stack([A1, C], axis=-1)
+    D_sq = _polymul(D, D)
+    N_D = _polymul(N, D)
+    quartic = _polyadd(
+        _polymul(np.stack([A2 * s, -A2], axis=-1), D_sq),
+        -(A2 + B2)[..., None] * N_D,
+        -C[..., None] * _polymul(np.stack([zero, np.ones_like(A1)], axis=-1), N_D),
+        -D2[..., None] * _polymul(N, N),
+    )
+    return quartic, N, D
+
+def polyroots(poly, rtol=1e-14):
+    """
+    Roots of a batch of polynomials through the eigenvalues of their companion matrices.
+    :param poly: Coefficients in ascending order, shape (n, degree + 1).
+    :return: Complex roots, shape (n, degree), padded with NaN where the degree is lower.
+    """
+    n, width = poly.shape
+    poly = poly / np.max(np.abs(poly), axis=1, keepdims=True)
+    roots = np.full((n, width - 1), np.nan, dtype=complex)
+
+    # Leading coefficients that vanish lower the degree, so group the rows by effective degree
+    significant = np.abs(poly) > rtol
+    degree = np.where(significant.any(axis=1), width - 1 - np.argmax(significant[:, ::-1], axis=1), 0)
+    for d in np.unique(degree):
+        if d < 1:
+            continue
+        rows = np.flatnonzero(degree == d)
+        monic = poly[rows, :d] / poly[rows, d:d + 1]
+        companion = np.zeros((rows.size, d, d))
+        companion[:, np.arange(1, d), np.arange(d - 1)] = 1.0
+        companion[:, :, -1] = -monic
+        roots[rows, :d] = np.linalg.eigvals(companion)
+    return roots
+
+def _polyval(poly, x):
+    # Horner evaluation of ascending coefficients (n, k) at points x (n, m)
+    value = np.zeros_like(x)
+    for k in range(poly.shape[-1] - 1, -1, -1):
+        value = value * x + poly[:, k:k + 1]
+    return value
+
+def resultant_solve(coeffs, tol=1e-6, polish=8):
+    """
+    Non-iterative steady state from the roots of the theta_O quartic.
+    Picks the root with both coverages in [0, 1] and a non-negative free site fraction.
+    :param coeffs: Output of rate_coefficients, all arrays of the same shape (n,).
+    :return: (theta_O, theta_N, found)
+    """
+    quartic, N, D = quartic_coefficients(coeffs)
+    quartic = quartic / np.max(np.abs(quartic), axis=1, keepdims=True)
+    roots = polyroots(quartic)
+    a = roots.real
+    real = np.abs(roots.imag) <= tol * np.maximum(np.abs(roots), 1.0)
+
+    # The eigenvalues lose accuracy next to much larger roots; a few Newton
+    # steps on the quartic itself restore it for the roots we care about
+    derivative = quartic[:, 1:] * np.arange(1, quartic.shape[1])
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for _ in range(polish):
+            step = _polyval(quartic, a) / _polyval(derivative, a)
+            a = np.where(real & (np.abs(a) <= 2) & np.isfinite(step), a - step, a)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        b = (N[:, :1] + N[:, 1:2] * a + N[:, 2:3] * a**2) / (D[:, :1] + D[:, 1:2] * a)
+
+    # One column per candidate root
+    c = {k: (v[:, None] if np.ndim(v) else v) for k, v in coeffs.items()}
+    physical = (real & (a >= -tol) & (a <= 1 + tol) & (b >= -tol) & (b <= 1 + tol)
+                & (1 - a - b - c["theta_OH"] >= -tol))
+
+    # Among the physical roots keep the one with the smallest scaled residual
+    with np.errstate(invalid="ignore", over="ignore"):
+        eq1, eq2 = balance(a, b, c)
+        misfit = np.where(physical, np.hypot(eq1, eq2) / _balance_scale(c), np.inf)
+    best = np.argmin(misfit, axis=1)
+    rows = np.arange(a.shape[0])
+    found = physical[rows, best]
+    theta_O = np.where(found, np.clip(a[rows, best], 0, 1), np.nan)
+    theta_N = np.where(found, np.clip(b[rows, best], 0, 1), np.nan)
+    return theta_O, theta_N, found
+
+def _positive_root(a, b, c):
+    # Non-negative root of a x**2 + b x - c with a, b, c >= 0, stable for a -> 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        root = 2 * c / (b + np.sqrt(b * b + 4 * a * c))
+    return np.where(c > 0, root, 0.0)
+
+def bisection_solve(coeffs, maxiter=80, diagnostics=None, rows=None):
+    """
+    Bracketed solve of the reduced 1-D problem, for the points the fast solvers get wrong.
+    eq1 gives theta_N = N(theta_O) / D(theta_O), which stays within the physical bounds
+    (theta_N >= 0 and free sites >= 0) for theta_O in [0, a_max], where N(a_max) = 0.
+    eq2 along that curve is <= 0 at theta_O = 0 and >= 0 at a_max, so it brackets a root.
+    The free sites are evaluated from their own cancellation-free expression rather than as s - theta_O - theta_N,
+    which keeps the sign of eq2 right when the surface is nearly saturated (low T, where desorption and LH underflow).
+    :return: (theta_O, theta_N)
+    """
+    A1, A2, B1, B2, C, D1, D2, s = _reduced_coefficients(coeffs)
+    n = A1.size
+    A1, A2, B1, B2, C, D1, D2, s = (np.ravel(v) for v in (A1, A2, B1, B2, C, D1, D2, s))
+
+    def theta_N_of(a):
+        # (theta_N, free sites) on the eq1 curve.
+        # Without oxygen adsorption eq1 only holds at a = 0 and eq2 alone fixes theta_N
+        with np.errstate(invalid="ignore", divide="ignore"):
+            b = (A1 * (s - a) - B1 * a - D1 * a * a) / (A1 + C * a)
+            free = (C * a * (s - a) + B1 * a + D1 * a * a) / (A1 + C * a)
+        b_none = _positive_root(D2, A2 + B2, A2 * s)
+        on_curve = A1 + C * a > 0
+        return (np.where(on_curve, np.clip(b, 0, s - a), b_none),
+                np.where(on_curve, np.where(b > 0, free, s - a), s - b_none))
+
+    def g(a):
+        b, free = theta_N_of(a)
+        return A2 * free - B2 * b - C * a * b - D2 * b * b
+
+    lo = np.zeros(n)
+    hi = _positive_root(D1, A1 + B1, A1 * s)
+    for _ in range(maxiter):
+        mid = 0.5 * (lo + hi)
+        up = g(mid) > 0
+        hi = np.where(up, mid, hi)
+        lo = np.where(up, lo, mid)
+        if diagnostics is not None:
+            diagnostics.log_iteration(rows, 1)
+        if np.all(hi - lo <= 4 * np.finfo(float).eps * np.maximum(hi, np.finfo(float).tiny)):
+            break
+    theta_O = 0.5 * (lo + hi)
+    return theta_O, theta_N_of(theta_O)[0]
+
+def _fsolve_point(coeffs, i, initial_guess=(0.5, 0.5), diagnostics=None, row=None):
+    c = _take(coeffs, i)
+
+    def SysEqs(theta):
+        eq1, eq2 = balance(theta[0], theta[1], c)
+        return [eq1, eq2]
+
+    if diagnostics is not None:
+        # Log the residual of every evaluation, fsolve has no per-iteration callback
+        row = np.array([i if row is None else row])
+        scale = _balance_scale(c)
+        solve_eqs = SysEqs
+
+        def SysEqs(theta):
+            eq = solve_eqs(theta)
+            diagnostics.log_residual(row, np.array([max(abs(eq[0]), abs(eq[1])) / scale]))
+            return eq
+
+    # Only the fallback needs scipy.optimize, which takes longer to import than the rest of the solver
+    from scipy.optimize import fsolve
+    theta, infodict, ier, msg = fsolve(SysEqs, list(initial_guess), full_output=True)
+    if diagnostics is not None:
+        diagnostics.log_fsolve(row, infodict, ier, msg)
+    return theta[0], theta[1], ier == 1
+
+def _physical(theta_O, theta_N, coeffs, tol=1e-9):
+    return ((theta_O >= -tol) & (theta_N >= -tol) & (theta_O <= 1 + tol) & (theta_N <= 1 + tol)
+            & (1 - theta_O - theta_N - coeffs["theta_OH"] >= -tol))
+
+def _losses(theta_O, theta_N, coeffs):
+    # Removal rates of O and N, the negative terms of eq1 and eq2
+    c = coeffs
+    LH_NO = c["k_LH_NO"] * theta_N * theta_O
+    loss_O = (c["gamma_star_OO"] * theta_O * c["n_O"] + c["gamma_star_NO"] * theta_O * c["n_N"]
+              + LH_NO + c["k_LH_OO"] * theta_O**2 + c["k_des_O"] * theta_O)
+    loss_N = (c["gamma_star_NN"] * theta_N * c["n_N"] + c["gamma_star_ON"] * theta_N * c["n_O"]
+              + LH_NO + c["k_LH_NN"] * theta_N**2 + c["k_des_N"] * theta_N)
+    return loss_O, loss_N
+
+def _valid(theta_O, theta_N, coeffs, rtol=1e-6):
+    # Physical coverages with a small scaled residual. On a nearly saturated surface (low T) the free sites
+    # are below the rounding of 1 - theta_O - theta_N, so any split of the sites passes that test; the
+    # free-site-independent combination ad_N * eq1 - ad_O * eq2 = ad_O * loss_N - ad_N * loss_O checks the split
+    with np.errstate(invalid="ignore", over="ignore"):
+        eq1, eq2 = balance(theta_O, theta_N, coeffs)
+        small = np.maximum(np.abs(eq1), np.abs(eq2)) <= rtol * _balance_scale(coeffs)
+        loss_O, loss_N = _losses(theta_O, theta_N, coeffs)
+        ad_O = coeffs["s_O"] * coeffs["n_O"]
+        ad_N = coeffs["s_N"] * coeffs["n_N"]
+        split = np.abs(ad_O * loss_N - ad_N * loss_O) <= rtol * (ad_O * loss_N + ad_N * loss_O)
+    return small & split & _physical(theta_O, theta_N, coeffs)
+
+def _escalate(coeffs, theta_O, theta_N, status, diagnostics=None, rows=None, rtol=1e-6):
+    """
+    Check every fast-path solution and re-solve the invalid or FAILED ones by bisection, polished by Newton, in place.
+    The bisection brackets a root of the reduced problem, but its result is checked like any other,
+    and the coverages of points that are still invalid are set to NaN so they cannot pass for solutions.
+    :param status: Tier of every point, updated to ROBUST for the re-solved points and FAILED if even that fails.
+    """
+    bad = np.flatnonzero(~_valid(theta_O, theta_N, coeffs, rtol) | (status == FAILED))
+    if bad.size == 0:
+        return
+    sub = _take(coeffs, bad)
+    sub_rows = None if diagnostics is None else (np.arange(theta_O.size) if rows is None else rows)[bad]
+    a, b = bisection_solve(sub, diagnostics=diagnostics, rows=sub_rows)
+    # theta_N(theta_O) can be ill-conditioned, so polish the bracketed root on the full system
+    a_new, b_new, _ = newton_solve(sub, a, b, maxiter=10, diagnostics=diagnostics, rows=sub_rows)
+    polished = _valid(a_new, b_new, sub, rtol)
+    a, b = np.where(polished, a_new, a), np.where(polished, b_new, b)
+    valid = _valid(a, b, sub, rtol)
+    theta_O[bad], theta_N[bad] = np.where(valid, a, np.nan), np.where(valid, b, np.nan)
+    status[bad] = np.where(valid, ROBUST, FAILED)
+    if diagnostics is not None:
+        eq1, eq2 = balance(a, b, sub)
+        diagnostics.log_residual(sub_rows, np.maximum(np.abs(eq1), np.abs(eq2)) / _balance_scale(sub))
+        diagnostics.status[sub_rows] = status[bad]
+
+def continuation_solve(coeffs, values, cold_guess=(0.5, 0.5), diagnostics=None, rows=None):
+    """
+    Solve along a sweep axis, seeding the points that fail from the neighbouring solutions.
+    Every point is first solved from the cold guess in one Newton batch; only the steps where that fails are
+    walked in order, each failed point seeded by extrapolation through the previous two steps, then fsolve.
+    :param coeffs: Output of rate_coefficients, arrays of shape (n_steps, n_lines); axis 0 is the sweep axis
+                   and the lines (the other grid axes) are solved together at every step.
+    :param values: Sweep coordinate of every step, shape (n_steps,).
+    :param diagnostics: ConvergenceDiagnostics to record the solver telemetry in.
+    :param rows: Rows of the points in diagnostics, shape (n_steps, n_lines).
+    :return: (theta_O, theta_N, status), arrays of shape (n_steps, n_lines)
+    """
+    values = np.asarray(values, dtype=float)
+    n_steps, n_lines = np.broadcast_shapes(*(np.shape(v) for v in coeffs.values()))
+    coeffs = {name: (np.ascontiguousarray(np.broadcast_to(v, (n_steps, n_lines))) if np.ndim(v) else v)
+              for name, v in coeffs.items()}
+
+    # A Python loop over the steps costs far more than the Newton iterations it saves, so batch first
+    flat = {name: (v.ravel() if np.ndim(v) else v) for name, v in coeffs.items()}
+    a, b, converged = newton_solve(flat, np.full(n_steps * n_lines, cold_guess[0]),
+                                   np.full(n_steps * n_lines, cold_guess[1]),
+                                   diagnostics=diagnostics, rows=None if diagnostics is None else rows.ravel())
+    failed = ~(converged & _physical(a, b, flat)).reshape(n_steps, n_lines)
+    theta_O = a.reshape(n_steps, n_lines)
+    theta_N = b.reshape(n_steps, n_lines)
+    status = np.full((n_steps, n_lines), CONVERGED, dtype=np.int8)
+
+    for k in np.flatnonzero(failed.any(axis=1)):
+        lines = np.flatnonzero(failed[k])
+        c = _take({name: (v[k] if np.ndim(v) else v) for name, v in coeffs.items()}, lines)
+        step_rows = None if diagnostics is None else rows[k, lines]
+
+        # Predictor: linear extrapolation through the last two solutions, or the last one
+        if k >= 2 and values[k - 1] != values[k - 2]:
+            slope = (values[k] - values[k - 1]) / (values[k - 1] - values[k - 2])
+            guess_O = theta_O[k - 1, lines] + slope * (theta_O[k - 1, lines] - theta_O[k - 2, lines])
+            guess_N = theta_N[k - 1, lines] + slope * (theta_N[k - 1, lines] - theta_N[k - 2, lines])
+        elif k >= 1:
+            guess_O, guess_N = theta_O[k - 1, lines], theta_N[k - 1, lines]
+        else:
+            guess_O, guess_N = None, None
+        ok = np.zeros(lines.size, dtype=bool)
+        if guess_O is not None:
+            a, b, ok = newton_solve(c, np.clip(guess_O, 0, 1), np.clip(guess_N, 0, 1),
+                                    diagnostics=diagnostics, rows=step_rows)
+            ok &= _physical(a, b, c)
+            theta_O[k, lines[ok]], theta_N[k, lines[ok]] = a[ok], b[ok]
+        for j in np.flatnonzero(~ok):
+            theta_O[k, lines[j]], theta_N[k, lines[j]], solved = _fsolve_point(
+                c, j, cold_guess, diagnostics=diagnostics, row=None if diagnostics is None else step_rows[j])
+            status[k, lines[j]] = FALLBACK if solved else FAILED
+    if diagnostics is not None:
+        diagnostics.status[rows] = status
+    return theta_O, theta_N, status
+
+def _solve(coeffs, method, diagnostics=None, rows=None):
+    n = np.broadcast_shapes(*(np.shape(v) for v in coeffs.values()))[0]
+    if diagnostics is not None and rows is None:
+        rows = np.arange(n)
+    status = np.full(n, CONVERGED, dtype=np.int8)
+    if method in ("newton", "resultant"):
+        if method == "resultant":
+            theta_O, theta_N, found = resultant_solve(coeffs)
+            theta_O[~found] = 0.5
+            theta_N[~found] = 0.5
+        else:
+            theta_O, theta_N = np.full(n, 0.5), np.full(n, 0.5)
+        theta_O, theta_N, converged = newton_solve(coeffs, theta_O, theta_N, diagnostics=diagnostics, rows=rows)
+        # Only the points Newton could not handle go through fsolve
+        for i in np.flatnonzero(~converged):
+            theta_O[i], theta_N[i], ok = _fsolve_point(coeffs, i, diagnostics=diagnostics,
+                                                       row=None if rows is None else rows[i])
+            status[i] = FALLBACK if ok else FAILED
+    elif method == "fsolve":
+        theta_O, theta_N = np.empty(n), np.empty(n)
+        for i in range(n):
+            theta_O[i], theta_N[i], ok = _fsolve_point(coeffs, i, diagnostics=diagnostics,
+                                                       row=None if rows is None else rows[i])
+            status[i] = CONVERGED if ok else FAILED
+    else:
+        raise ValueError(f"Unknown method: {method}")
+    if diagnostics is not None:
+        diagnostics.status[rows] = status
+    return theta_O, theta_N, status
+
+# Column layout of every result
+RESULT_COLUMNS = (
+    "theta_O", "theta_N", "T", "P", "C_O", "x",
+    "gamma_OO", "gamma_NN", "gamma_ON", "gamma_NO",
+    "omega_ad_O", "omega_ad_N",
+    "omega_ER_OO", "omega_ER_NN", "omega_ER_ON", "omega_ER_NO",
+    "omega_LH_OO", "omega_LH_NN", "omega_LH_NO",
+    "omega_des_O", "omega_des_N",
+    "residual_O", "residual_N",
+    "status",
+)
+
+def solve_coefficients(coeffs, theta_O=None, theta_N=None):
+    """
+    Steady state for flat arrays of rate coefficients, e.g. from rate_coefficients, warm-started where coverages
+    are given. Points the warm start does not solve are re-solved like method='newton', then checked by _escalate.
+    :param theta_O, theta_N: Coverages to start Newton from, NaN (or None) for a cold start.
+    :return: (theta_O, theta_N, status)
+    """
+    n = np.broadcast_shapes(*(np.shape(v) for v in coeffs.values()))[0]
+    theta_O = np.full(n, np.nan) if theta_O is None else np.array(theta_O, dtype=float)
+    theta_N = np.full(n, np.nan) if theta_N is None else np.array(theta_N, dtype=float)
+    warm = np.flatnonzero(np.isfinite(theta_O) & np.isfinite(theta_N))
+    cold = np.setdiff1d(np.arange(n), warm)
+    status = np.full(n, CONVERGED, dtype=np.int8)
+    if warm.size:
+        sub = _take(coeffs, warm)
+        a, b, converged = newton_solve(sub, theta_O[warm], theta_N[warm])
+        theta_O[warm], theta_N[warm] = a, b
+        cold = np.union1d(cold, warm[~(converged & _physical(a, b, sub))])
+    if cold.size:
+        theta_O[cold], theta_N[cold], status[cold] = _solve(_take(coeffs, cold), "newton")
+    _escalate(coeffs, theta_O, theta_N, status)
+    return theta_O, theta_N, status
+
+def _result_columns(coeffs, theta_O, theta_N, T, P, C_O, status):
+    # Every column is one row of a single contiguous (n_columns, n_points) block
+    block = np.empty((len(RESULT_COLUMNS), np.size(T)))
+    res_dict = dict(zip(RESULT_COLUMNS, block))
+
+    res_dict["theta_O"][:] = theta_O
+    res_dict["theta_N"][:] = theta_N
+    res_dict["T"][:] = T
+    res_dict["P"][:] = P
+    res_dict["C_O"][:] = C_O
+    np.divide(1000, T, out=res_dict["x"])
+
+    omega = reaction_rates(theta_O, theta_N, coeffs)
+    for name, value in omega.items():
+        res_dict[name][:] = value
+    for name, value in recombination_coefficients(omega, coeffs).items():
+        res_dict[name][:] = value
+    res_dict["residual_O"][:], res_dict["residual_N"][:] = balance(theta_O, theta_N, coeffs)
+    res_dict["status"][:] = status
+    return res_dict
+
+def _result_block(res_dict):
+    # The (n_columns, n_points) block behind the columns of _result_columns, stacked if they do not share one
+    values = list(res_dict.values())
+    block = values[0].base
+    if (block is not None and block.shape == (len(values), values[0].size)
+            and all(np.shares_memory(v, row) for v, row in zip(values, block))):
+        return block
+    return np.stack(values)
+
+def to_dataframe(res_dict):
+    """DataFrame over the result columns, without copying them when they share one block."""
+    import pandas as pd
+    return pd.DataFrame(_result_block(res_dict).T, columns=list(res_dict), copy=False)
+
+def to_structured(res_dict):
+    """Results as a NumPy structured array with one float64 field per column."""
+    out = np.empty(len(next(iter(res_dict.values()))), dtype=[(name, "f8") for name in res_dict])
+    for name, value in res_dict.items():
+        out[name] = value
+    return out
+
+def format_results(res_dict, output):
+    """Result columns as a DataFrame, the column dictionary itself or a structured array."""
+    if output == "dataframe":
+        return to_dataframe(res_dict)
+    if output == "arrays":
+        return res_dict
+    if output == "structured":
+        return to_structured(res_dict)
+    raise ValueError(f"Unknown output: {output}")
+
+def solve_points(params, T, P, C_O, method="newton", diagnostics=None):
+    """
+    Solve the steady state for a flat batch of (T, P, C_O) points.
+    :param method: 'newton' for the batched damped Newton solver with fsolve fallback,
+                   'resultant' for the roots of the eliminated quartic, polished by Newton,
+                   'fsolve' for the point-by-point solver,
+                   'continuation' for batched Newton that re-seeds the points it fails on from the previous ones,
+                   in the given order.
+                   Whatever the method, points with unphysical coverages or a large residual are re-solved by
+                   bisection; the status column holds the tier that solved each point (see diagnostics.STATUS_NAMES),
+                   and the coverages of FAILED points are NaN.
+    :param diagnostics: ConvergenceDiagnostics with one row per point, to record the solver telemetry in.
+    :return: Dictionary of result columns.
+    """
+    T, P, C_O = np.broadcast_arrays(np.asarray(T, dtype=float), np.asarray(P, dtype=float), np.asarray(C_O, dtype=float))
+    T, P, C_O = T.ravel(), P.ravel(), C_O.ravel()
+    coeffs = rate_coefficients(params, T, P, C_O)
+
+    if method == "continuation":
+        # Arc length along the path in (T, P, C_O) is the sweep coordinate
+        steps = np.sqrt(np.diff(T)**2 + np.diff(P)**2 + np.diff(C_O)**2)
+        values = np.concatenate([[0.0], np.cumsum(steps)])
+        rows = None if diagnostics is None else np.arange(T.size)[:, None]
+        theta_O, theta_N, status = continuation_solve({k: (v[:, None] if np.ndim(v) else v) for k, v in coeffs.items()},
+                                                      values, diagnostics=diagnostics, rows=rows)
+        theta_O, theta_N, status = theta_O[:, 0], theta_N[:, 0], status[:, 0]
+    else:
+        theta_O, theta_N, status = _solve(coeffs, method, diagnostics=diagnostics)
+    _escalate(coeffs, theta_O, theta_N, status, diagnostics=diagnostics)
+    return _result_columns(coeffs, theta_O, theta_N, T, P, C_O, status)
+
+SWEEP_AXES = ("T", "P", "C_O")
+
+def solve_grid(params, temperatures, pressures, C_O, method="newton", sweep_axis="T", cache=None, diagnostics=None):
+    """
+    Solve the steady state on the Cartesian product temperatures x pressures x C_O.
+    :param sweep_axis: Axis walked by the 'continuation' method, one of 'T', 'P', 'C_O'.
+    :param cache: PointCache (or the path of one); a grid solved before with the same parameters, axes and method
+                  is read back instead of solved. Grids with FAILED points are not stored.
+    :param diagnostics: ConvergenceDiagnostics with one row per grid point, to record the solver telemetry in.
+    :return: Dictionary of result columns, temperatures outermost and C_O innermost.
+    """
+    axes = [np.atleast_1d(np.asarray(v, dtype=float)) for v in (temperatures, pressures, C_O)]
+    T, P, C = np.meshgrid(*axes, indexing="ij")
+
+    if cache is not None:
+        if diagnostics is not None:
+            raise ValueError("Diagnostics cannot be recorded for points taken from a cache")
+        settings = f"{method}:{sweep_axis}" if method == "continuation" else method
+        solve_fn = lambda: solve_grid(params, *axes, method=method, sweep_axis=sweep_axis)
+        keep = lambda solved: not np.any(solved["status"] == FAILED)
+        if isinstance(cache, PointCache):
+            block = cache.solve(params, axes, RESULT_COLUMNS, settings, solve_fn, keep=keep)
+        else:
+            with PointCache(cache) as opened:
+                block = opened.solve(params, axes, RESULT_COLUMNS, settings, solve_fn, keep=keep)
+        return dict(zip(RESULT_COLUMNS, block))
+    # Temperature-only factors are computed once per temperature and broadcast over P and C_O
+    coeffs = rate_coefficients(params, axes[0][:, None, None], P, C, cache=True)
+
+    if method == "continuation":
+        if sweep_axis not in SWEEP_AXES:
+            raise ValueError(f"Unknown sweep axis: {sweep_axis}")
+        axis = SWEEP_AXES.index(sweep_axis)
+        # Sweep axis first, every other grid axis becomes an independent line
+        lines = {k: (np.moveaxis(np.broadcast_to(v, T.shape), axis, 0).reshape(T.shape[axis], -1) if np.ndim(v) else v)
+                 for k, v in coeffs.items()}
+        rows = None
+        if diagnostics is not None:
+            rows = np.moveaxis(np.arange(T.size).reshape(T.shape), axis, 0).reshape(T.shape[axis], -1)
+        theta_O, theta_N, status = continuation_solve(lines, axes[axis], diagnostics=diagnostics, rows=rows)
+        shape = np.moveaxis(T, axis, 0).shape
+        theta_O = np.moveaxis(theta_O.reshape(shape), 0, axis).ravel()
+        theta_N = np.moveaxis(theta_N.reshape(shape), 0, axis).ravel()
+        status = np.moveaxis(status.reshape(shape), 0, axis).ravel()
+        coeffs = {k: (np.broadcast_to(v, T.shape).ravel() if np.ndim(v) else v) for k, v in coeffs.items()}
+    else:
+        coeffs = {k: (np.broadcast_to(v, T.shape).ravel() if np.ndim(v) else v) for k, v in coeffs.items()}
+        theta_O, theta_N, status = _solve(coeffs, method, diagnostics=diagnostics)
+    _escalate(coeffs, theta_O, theta_N, status, diagnostics=diagnostics)
+    return _result_columns(coeffs, theta_O, theta_N, T.ravel(), P.ravel(), C.ravel(), status)
+
+def resolve_composition(params, C_O):
+    # Use CO and CN from function arguments if provided, otherwise use from params
+    if C_O is None:
+        C_O = params.C0 if params.C0 is not None else 10 / 11
+    return C_O
+
+def sweep(temperatures, pressures, param_file, C_O=10/11, method="newton", sweep_axis="T", cache=None):
+    """
+    Solve the full product temperatures x pressures x C_O in one call.
+    Each argument may be a scalar or a 1-D array.
+    :return: SweepResult with N-dimensional views of every column and the grid coordinates.
+    """
+    params = load_parameters(param_file)
+    C_O = resolve_composition(params, C_O)
+    res_dict = solve_grid(params, temperatures, pressures, C_O, method=method, sweep_axis=sweep_axis, cache=cache)
+    return SweepResult(_result_block(res_dict), RESULT_COLUMNS, (temperatures, pressures, C_O))
+
+def calculate(temperatures, pressures, param_file, C_O=10/11, method="newton", sweep_axis="T", output="dataframe",
+              cache=None, diagnostics=False, max_history=32, sensitivities=False):
+    """
+    Long-format results on temperatures x pressures x C_O; C_O may be a scalar or an array.
+    :param output: 'dataframe', 'arrays' for a dictionary of column arrays sharing one block,
+                   or 'structured' for a NumPy structured array.
+    :param cache: PointCache or path of its file, to reuse grids solved by earlier runs.
+    :param diagnostics: If True, also record per-point solver telemetry and return (results, ConvergenceDiagnostics).
+    :param max_history: Residuals kept per point in the diagnostics.
+    :param sensitivities: True, or a list of parameter names, to also return the derivatives of theta and gamma
+                          with respect to the parameters, see sensitivity.parameter_sensitivities.
+    :return: results, followed by the diagnostics and the sensitivities (in the same output format) when requested.
+    """
+    # Load parameters from the specified file
+    params = load_parameters(param_file)
+    C_O = resolve_composition(params, C_O)
+
+    record = None
+    if diagnostics:
+        axes = (temperatures, pressures, C_O)
+        record = ConvergenceDiagnostics(int(np.prod([np.size(v) for v in axes])), max_history=max_history, coords=axes)
+
+    # Temperatures are the outer loop, pressures the middle one and C_O the inner one
+    res_dict = solve_grid(params, temperatures, pressures, C_O, method=method, sweep_axis=sweep_axis, cache=cache,
+                          diagnostics=record)
+
+    returned = [format_results(res_dict, output)]
+    if diagnostics:
+        returned.append(record)
+    if sensitivities is not False and sensitivities is not None:
+        from sensitivity import parameter_sensitivities
+        names = None if sensitivities is True else sensitivities
+        returned.append(format_results(parameter_sensitivities(params, res_dict, names=names), output))
+    return returned[0] if len(returned) == 1 else tuple(returned)
+
+def iter_calculate(temperatures, pressures, param_file, C_O=10/11, chunk_size=65536, method="newton", output="arrays"):
+    """
+    Solve temperatures x pressures x C_O chunk by chunk, in the same row order as calculate.
+    Only one chunk of points and results is held at a time, so memory does not grow with the grid.
+    :param output: Format of every chunk, see calculate.
+    """
+    params = load_parameters(param_file)
+    C_O = resolve_composition(params, C_O)
+    axes = [np.atleast_1d(np.asarray(v, dtype=float)) for v in (temperatures, pressures, C_O)]
+    shape = tuple(axis.size for axis in axes)
+    n = int(np.prod(shape))
+
+    for start in range(0, n, chunk_size):
+        i, j, k = np.unravel_index(np.arange(start, min(start + chunk_size, n)), shape)
+        res_dict = solve_points(params, axes[0][i], axes[1][j], axes[2][k], method=method)
+        yield format_results(res_dict, output)
+
+def calculate_composition_sweep(temperatures, pressures, param_file, C_O_values, method="newton", output="dataframe"):
+    """
+    One result per O mole fraction, solved together.
+    With method='continuation' every grid point is continued along C_O.
+    """
+    sweep_axis = "C_O" if method == "continuation" else "T"
+    result = sweep(temperatures, pressures, param_file, C_O_values, method=method, sweep_axis=sweep_axis)
+    results_list = []
+    for j in range(len(C_O_values)):
+        part = result.isel(C_O=j)
+        results_list.append(format_results(dict(zip(part.columns, part.block)), output))
+    return results_list
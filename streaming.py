@@ -0,0 +1,205 @@
+import csv
+
+import numpy as np
+
+# A sink is anything with append(chunk) and close(); result_store.ResultStoreWriter is one.
+
+class RunningStats:
+    """
+    Count, mean, variance, min and max of every column, folded in chunk by chunk.
+    Chunks are merged with the pairwise update of Chan et al., so the result does not depend on chunk size.
+    :param ddof: The variance divides by count - ddof, 1 for the sample variance like SampleStats and pandas.
+    """
+
+    def __init__(self, columns=None, ddof=1):
+        self.columns = columns
+        self.ddof = ddof
+        self.count = 0
+        self.mean = {}
+        self._m2 = {}
+        self.min = {}
+        self.max = {}
+
+    def append(self, chunk):
+        names = self.columns or list(chunk.keys())
+        n = len(chunk[names[0]])
+        if n == 0:
+            return
+        total = self.count + n
+        for name in names:
+            value = np.asarray(chunk[name], dtype=float)
+            mean = value.mean()
+            m2 = ((value - mean)**2).sum()
+            if self.count == 0:
+                self.mean[name], self._m2[name] = mean, m2
+                self.min[name], self.max[name] = value.min(), value.max()
+            else:
+                delta = mean - self.mean[name]
+                self.mean[name] += delta * n / total
+                self._m2[name] += m2 + delta**2 * self.count * n / total
+                self.min[name] = min(self.min[name], value.min())
+                self.max[name] = max(self.max[name], value.max())
+        self.count = total
+
+    @property
+    def var(self):
+        if not self.count:
+            return {}
+        return {name: m2 / (self.count - self.ddof) if self.count > self.ddof else np.nan for name, m2 in self._m2.items()}
+
+    @property
+    def std(self):
+        return {name: np.sqrt(v) for name, v in self.var.items()}
+
+    def summary(self):
+        import pandas as pd
+        return pd.DataFrame({"mean": self.mean, "std": self.std, "min": self.min, "max": self.max})
+
+    def close(self):
+        pass
+
+class CsvSink:
+    """Appends every chunk to one CSV file, header first."""
+
+    def __init__(self, filename, columns=None):
+        self.columns = columns
+        self._file = open(filename, "w", newline="")
+        self._writer = csv.writer(self._file)
+        self._header = False
+
+    def append(self, chunk):
+        names = self.columns or list(chunk.keys())
+        if not self._header:
+            self._writer.writerow(names)
+            self._header = True
+        self._writer.writerows(np.column_stack([np.asarray(chunk[name]) for name in names]).tolist())
+
+    def close(self):
+        self._file.close()
+
+def consume(chunks, *sinks):
+    """
+    Feed every chunk to every sink as soon as it is produced, then close the sinks.
+    :return: Number of rows consumed.
+    """
+    rows = 0
+    try:
+        for chunk in chunks:
+            for sink in sinks:
+                sink.append(chunk)
+            rows += len(chunk[next(iter(chunk.keys()))])
+    finally:
+        for sink in sinks:
+            sink.close()
+    return rows
+
+class SampleStats:
+    """
+    Mean, variance, min, max and quantiles of many samples of an array, per element.
+    Samples are folded in chunk by chunk. Up to one sample per histogram bin they are kept as they are,
+    which takes less memory than the histogram, and the quantiles are exact. Beyond that they are counted
+    in a histogram of log10(value) with fixed edges and dropped, so partial results from several processes
+    merge exactly.
+    :param shape: Shape of one sample.
+    :param edges: Histogram edges of log10(value), default 480 bins over [-12, 0];
+                  values outside fall into the first or last bin.
+    :param ddof: The variance divides by count - ddof.
+    """
+
+    def __init__(self, shape, edges=None, ddof=1):
+        self.shape = tuple(shape)
+        self.edges = np.linspace(-12, 0, 481) if edges is None else np.asarray(edges, dtype=float)
+        self.ddof = ddof
+        self.count = 0
+        self.mean = np.zeros(self.shape)
+        self._m2 = np.zeros(self.shape)
+        self.min = np.full(self.shape, np.inf)
+        self.max = np.full(self.shape, -np.inf)
+        # Raw samples until there are more than bins, then the histogram
+        self._samples = []
+        self.histogram = None
+
+    def append(self, samples):
+        """Fold in samples of shape (n_samples,) + shape."""
+        samples = np.asarray(samples, dtype=float).reshape((-1,) + self.shape)
+        n = samples.shape[0]
+        if n == 0:
+            return
+        mean = samples.mean(axis=0)
+        m2 = ((samples - mean)**2).sum(axis=0)
+        self._merge(n, mean, m2, samples.min(axis=0), samples.max(axis=0))
+        self._collect(samples.copy())
+
+    def _collect(self, samples):
+        # Called once count includes the samples
+        if self.histogram is None and self.count <= self.edges.size - 1:
+            self._samples.append(samples)
+            return
+        self._to_histogram()
+        self._bin(samples)
+
+    def _to_histogram(self):
+        if self.histogram is not None:
+            return
+        self.histogram = np.zeros(self.shape + (self.edges.size - 1,), dtype=np.int64)
+        pending, self._samples = self._samples, None
+        for samples in pending:
+            self._bin(samples)
+
+    def _bin(self, samples):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log = np.log10(samples)
+        bins = np.clip(np.searchsorted(self.edges, log, side="right") - 1, 0, self.edges.size - 2)
+        # Count every (element, bin) pair at once
+        flat = (np.arange(int(np.prod(self.shape))).reshape(self.shape) * (self.edges.size - 1) + bins).ravel()
+        self.histogram += np.bincount(flat, minlength=self.histogram.size).reshape(self.histogram.shape)
+
+    def _merge(self, n, mean, m2, lo, hi):
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * n / total
+        self._m2 = self._m2 + m2 + delta**2 * self.count * n / total
+        self.min = np.minimum(self.min, lo)
+        self.max = np.maximum(self.max, hi)
+        self.count = total
+
+    def merge(self, other):
+        """Fold in the statistics gathered by another SampleStats with the same shape and edges."""
+        if other.count:
+            self._merge(other.count, other.mean, other._m2, other.min, other.max)
+            if other.histogram is None:
+                for samples in other._samples:
+                    self._collect(samples)
+            else:
+                self._to_histogram()
+                self.histogram += other.histogram
+        return self
+
+    @property
+    def var(self):
+        if self.count <= self.ddof:
+            return np.full(self.shape, np.nan)
+        return self._m2 / (self.count - self.ddof)
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+    def quantile(self, q):
+        """
+        Quantile q of every element, exact while the samples are kept,
+        otherwise interpolated log-linearly within its histogram bin.
+        """
+        if self.histogram is None:
+            return np.quantile(np.concatenate(self._samples), q, axis=0)
+        cumulative = np.cumsum(self.histogram, axis=-1)
+        target = q * self.count
+        i = np.minimum((cumulative < target).sum(axis=-1), self.edges.size - 2)
+        before = np.take_along_axis(cumulative, i[..., None], axis=-1)[..., 0] - \
+            np.take_along_axis(self.histogram, i[..., None], axis=-1)[..., 0]
+        inside = np.take_along_axis(self.histogram, i[..., None], axis=-1)[..., 0]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraction = np.where(inside > 0, (target - before) / inside, 0.5)
+        log = self.edges[i] + np.clip(fraction, 0, 1) * (self.edges[i + 1] - self.edges[i])
+        # The exact extremes are known, so the quantile never leaves them
+        return np.clip(10**log, self.min, self.max)
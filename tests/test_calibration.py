@@ -0,0 +1,32 @@
+import numpy as np
+
+from parameters import load_parameters
+from solver import solve_points
+from calibration import Measurement, calibrate, _Model
+
+COLUMNS = ("gamma_OO", "gamma_NO", "gamma_ON")
+
+def _measurements(params):
+    T = np.linspace(500, 2000, 30)
+    results = solve_points(params, T, 1000., 10/11)
+    return [Measurement(T, results[column], 1000., column=column) for column in COLUMNS]
+
+def test_jacobian_matches_finite_differences():
+    base = load_parameters("Sio2_para.py")
+    names = ["D_NO", "Qa_O", "Em_O", "D_OO", "s_O"]
+    model = _Model(base, _measurements(base.derive(D_NO=base.D_NO * 1.03)), names)
+    x = np.array([getattr(base, name) for name in names])
+    jac = model.jacobian(x)
+    fd = np.empty_like(jac)
+    for j in range(x.size):
+        h = np.zeros_like(x)
+        h[j] = 1e-6 * x[j]
+        fd[:, j] = (model.residuals(x + h) - model.residuals(x - h)) / (2 * h[j])
+    assert np.all(np.abs(fd).max(axis=0) > 0)
+    np.testing.assert_allclose(jac, fd, rtol=1e-4, atol=1e-6 * np.abs(fd).max())
+
+def test_calibrate_recovers_derived_energy():
+    base = load_parameters("Sio2_para.py")
+    true = base.derive(D_NO=base.D_NO * 1.03)
+    result = calibrate(base, _measurements(true), ["D_NO"])
+    assert abs(result.values["D_NO"] / true.D_NO - 1) < 1e-6
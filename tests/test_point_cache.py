@@ -0,0 +1,20 @@
+import numpy as np
+
+from solver import calculate, sweep
+
+T = np.linspace(300, 3000, 50)
+P = [100., 1000.]
+
+def test_sweep_twice_with_cache(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first = sweep(T, P, "Sio2_para.py", cache=path)
+    second = sweep(T, P, "Sio2_para.py", cache=path)
+    assert second.block.shape == first.block.shape
+    np.testing.assert_array_equal(second.block, first.block)
+
+def test_sweep_reads_grid_cached_by_calculate(tmp_path):
+    path = str(tmp_path / "cache.db")
+    frame = calculate(T, P, "Sio2_para.py", cache=path)
+    result = sweep(T, P, "Sio2_para.py", C_O=10/11, cache=path)
+    np.testing.assert_array_equal(result.block, frame.to_numpy().T)
+    np.testing.assert_array_equal(calculate(T, P, "Sio2_para.py", cache=path).to_numpy(), frame.to_numpy())
@@ -0,0 +1,199 @@
+import numpy as np
+
+from parameters import Parameters, load_parameters
+from solver import rate_coefficients, balance, jacobian, resolve_composition
+
+# L-stable, stiffly accurate two-stage SDIRK (Alexander); the embedded first-order
+# solution y + h * k1 gives the error estimate.
+GAMMA = 1 - 2**-0.5
+
+def coverage_rates(theta_O, theta_N, coeffs, nsite):
+    """dtheta/dt = (production - loss) / nsite of both coverages."""
+    eq1, eq2 = balance(theta_O, theta_N, coeffs)
+    return eq1 / nsite, eq2 / nsite
+
+class CoverageIntegrator:
+    """
+    Advances the O/N coverages of many surface elements at once with an adaptive implicit
+    SDIRK method and the analytic Jacobian of the balance equations.
+    T, P and C_O are scalars, arrays with one value per element, or callables f(t) returning either;
+    set_conditions() swaps them between steps, e.g. when coupling to a CFD solver.
+    """
+
+    def __init__(self, param_file, theta_O, theta_N, T, P, C_O=10/11, t0=0.0, rtol=1e-4, atol=1e-10,
+                 dt=None, max_newton=8):
+        self.params = param_file if isinstance(param_file, Parameters) else load_parameters(param_file)
+        self.theta_O = np.array(theta_O, dtype=float)
+        self.theta_N = np.array(theta_N, dtype=float)
+        self.theta_O, self.theta_N = np.broadcast_arrays(self.theta_O, self.theta_N)
+        self.theta_O, self.theta_N = self.theta_O.copy(), self.theta_N.copy()
+        self.t = float(t0)
+        self.rtol = rtol
+        self.atol = atol
+        self.max_newton = max_newton
+        self.steps = 0
+        self.rejected = 0
+        self.set_conditions(T, P, resolve_composition(self.params, C_O))
+        self.dt = dt
+
+    def set_conditions(self, T=None, P=None, C_O=None):
+        """Replace any of the wall conditions; unchanged ones are kept."""
+        if T is not None:
+            self._T = T
+        if P is not None:
+            self._P = P
+        if C_O is not None:
+            self._C_O = C_O
+        self._steady = not any(callable(v) for v in (self._T, self._P, self._C_O))
+        self._coeffs = None
+        # A jump in the conditions starts a new transient, so the old step size is no guide
+        self.dt = None
+
+    def coefficients(self, t):
+        """Rate coefficients at time t, computed once while the conditions do not depend on time."""
+        if self._steady and self._coeffs is not None:
+            return self._coeffs
+        T, P, C_O = (v(t) if callable(v) else v for v in (self._T, self._P, self._C_O))
+        # Time-varying temperatures would only churn the rate table cache
+        coeffs = rate_coefficients(self.params, T, P, C_O, cache=self._steady)
+        if self._steady:
+            self._coeffs = coeffs
+        return coeffs
+
+    def rates(self, t=None):
+        t = self.t if t is None else t
+        return coverage_rates(self.theta_O, self.theta_N, self.coefficients(t), self.params.nsite)
+
+    def _scale(self, a, b):
+        return self.atol + self.rtol * np.abs(a), self.atol + self.rtol * np.abs(b)
+
+    def _stage(self, coeffs, base_O, base_N, hg, a, b):
+        """
+        Newton solve of Y = base + h * gamma * f(Y) for every element, starting from (a, b).
+        :return: (a, b, converged)
+        """
+        nsite = self.params.nsite
+        for _ in range(self.max_newton):
+            f1, f2 = coverage_rates(a, b, coeffs, nsite)
+            g1 = a - base_O - hg * f1
+            g2 = b - base_N - hg * f2
+            j11, j12, j21, j22 = jacobian(a, b, coeffs)
+            m11 = 1 - hg * j11 / nsite
+            m12 = -hg * j12 / nsite
+            m21 = -hg * j21 / nsite
+            m22 = 1 - hg * j22 / nsite
+            det = m11 * m22 - m12 * m21
+            da = (-g1 * m22 + g2 * m12) / det
+            db = (-g2 * m11 + g1 * m21) / det
+            a = a + da
+            b = b + db
+            s1, s2 = self._scale(a, b)
+            change = np.max(np.maximum(np.abs(da) / s1, np.abs(db) / s2), initial=0.0)
+            if not np.isfinite(change):
+                break
+            if change <= 1e-2:
+                return a, b, True
+        return a, b, False
+
+    def _initial_step(self, span):
+        f1, f2 = self.rates()
+        s1, s2 = self._scale(self.theta_O, self.theta_N)
+        speed = np.max(np.maximum(np.abs(f1) / s1, np.abs(f2) / s2), initial=0.0)
+        h = 0.01 / speed if speed > 0 else span
+        return min(h, span)
+
+    def _try_step(self, h):
+        # One SDIRK step of size h from self.t; returns (a, b, error norm), error norm inf on Newton failure
+        y_O, y_N = self.theta_O, self.theta_N
+        hg = h * GAMMA
+        nsite = self.params.nsite
+
+        c1 = self.coefficients(self.t + GAMMA * h)
+        a1, b1, ok = self._stage(c1, y_O, y_N, hg, y_O, y_N)
+        if not ok:
+            return a1, b1, np.inf
+        k1_O = (a1 - y_O) / hg
+        k1_N = (b1 - y_N) / hg
+
+        c2 = self.coefficients(self.t + h)
+        base_O = y_O + h * (1 - GAMMA) * k1_O
+        base_N = y_N + h * (1 - GAMMA) * k1_N
+        a2, b2, ok = self._stage(c2, base_O, base_N, hg, a1, b1)
+        if not ok:
+            return a2, b2, np.inf
+
+        # Embedded estimate h * gamma * (k2 - k1), filtered through (I - h gamma J)^-1 so stiff
+        # components do not inflate it
+        k2_O = (a2 - base_O) / hg
+        k2_N = (b2 - base_N) / hg
+        e1 = hg * (k2_O - k1_O)
+        e2 = hg * (k2_N - k1_N)
+        j11, j12, j21, j22 = jacobian(a2, b2, c2)
+        m11 = 1 - hg * j11 / nsite
+        m12 = -hg * j12 / nsite
+        m21 = -hg * j21 / nsite
+        m22 = 1 - hg * j22 / nsite
+        det = m11 * m22 - m12 * m21
+        e1, e2 = (e1 * m22 - e2 * m12) / det, (e2 * m11 - e1 * m21) / det
+
+        s1 = self.atol + self.rtol * np.maximum(np.abs(y_O), np.abs(a2))
+        s2 = self.atol + self.rtol * np.maximum(np.abs(y_N), np.abs(b2))
+        error = np.sqrt(0.5 * ((e1 / s1)**2 + (e2 / s2)**2))
+        return a2, b2, np.max(error, initial=0.0)
+
+    def advance(self, dt, max_steps=100_000):
+        """
+        Integrate from the current time to t + dt with as many adaptive substeps as needed.
+        :return: (theta_O, theta_N) at the new time.
+        """
+        t_end = self.t + dt
+        h = self.dt if self.dt is not None else self._initial_step(dt)
+        for _ in range(max_steps):
+            remaining = t_end - self.t
+            if remaining <= 1e-12 * max(abs(t_end), dt):
+                break
+            last = h >= remaining
+            h = min(h, remaining)
+            a, b, error = self._try_step(h)
+            if error <= 1:
+                self.t = t_end if last else self.t + h
+                self.theta_O, self.theta_N = a, b
+                self.steps += 1
+                # Remember the step the controller wants, not the one shortened to hit t_end
+                factor = 5.0 if error == 0 else min(5.0, max(0.2, 0.9 * error**-0.5))
+                if not last:
+                    self.dt = h * factor
+                h = h * factor
+            else:
+                self.rejected += 1
+                h = h * (0.25 if not np.isfinite(error) else max(0.2, 0.9 * error**-0.5))
+                if h <= 1e-14 * max(abs(self.t), dt):
+                    raise RuntimeError(f"Step size underflow at t={self.t}")
+        else:
+            raise RuntimeError(f"No convergence to t={t_end} within {max_steps} steps")
+        return self.theta_O, self.theta_N
+
+    def integrate(self, t_eval):
+        """
+        Coverages at every time of t_eval (ascending, starting at or after the current time).
+        :return: Dictionary with 't' and 'theta_O', 'theta_N' of shape (len(t_eval),) + element shape.
+        """
+        t_eval = np.asarray(t_eval, dtype=float)
+        theta_O = np.empty(t_eval.shape + self.theta_O.shape)
+        theta_N = np.empty(t_eval.shape + self.theta_N.shape)
+        for i, t in enumerate(t_eval):
+            if t > self.t:
+                self.advance(t - self.t)
+            theta_O[i], theta_N[i] = self.theta_O, self.theta_N
+        return {"t": t_eval, "theta_O": theta_O, "theta_N": theta_N}
+
+def integrate_coverage(param_file, theta_O, theta_N, t_eval, T, P, C_O=10/11, rtol=1e-4, atol=1e-10):
+    """
+    Coverage trajectories of many surface elements from t_eval[0] on, see CoverageIntegrator.
+    :return: Dictionary with 't', 'theta_O', 'theta_N' and the number of accepted and rejected steps.
+    """
+    integrator = CoverageIntegrator(param_file, theta_O, theta_N, T, P, C_O=C_O, t0=t_eval[0], rtol=rtol, atol=atol)
+    out = integrator.integrate(t_eval)
+    out["steps"] = integrator.steps
+    out["rejected"] = integrator.rejected
+    return out
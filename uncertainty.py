@@ -0,0 +1,147 @@
+import os
+from concurrent.futures import as_completed
+
+import numpy as np
+from scipy.stats import qmc, norm
+
+from parameters import Parameters, load_parameters
+from solver import rate_coefficients, solve_coefficients, reaction_rates, recombination_coefficients, resolve_composition
+from streaming import SampleStats
+from parallel import worker_pool, init_worker, worker_state
+
+UNCERTAINTY_OUTPUTS = ("gamma_OO", "gamma_NN", "gamma_ON", "gamma_NO")
+
+def _transform(u, distribution):
+    # Unit-interval samples to parameter values through the inverse CDF
+    kind, a, b = distribution
+    if kind == "uniform":
+        return a + u * (b - a)
+    if kind == "loguniform":
+        return a * (b / a)**u
+    if kind == "normal":
+        return norm.ppf(u, loc=a, scale=b)
+    if kind == "lognormal":
+        # Median a and multiplicative standard deviation b, e.g. ('lognormal', 0.1, 3) for "0.1 within a factor of 3"
+        return a * b**norm.ppf(u)
+    raise ValueError(f"Unknown distribution: {kind}")
+
+def sample_parameters(distributions, n_samples, method="sobol", seed=None):
+    """
+    Space-filling samples of the uncertain parameters.
+    :param distributions: {name: (kind, a, b)} with kind 'uniform' (a = lower, b = upper), 'loguniform'
+                          (a = lower, b = upper), 'normal' (a = mean, b = standard deviation) or
+                          'lognormal' (a = median, b = multiplicative standard deviation).
+    :param method: 'sobol', 'lhs' (Latin hypercube) or 'random'.
+    :return: Array of shape (n_samples, len(distributions)), columns in the order of distributions.
+    """
+    d = len(distributions)
+    if method == "sobol":
+        u = qmc.Sobol(d, seed=seed).random(n_samples)
+    elif method == "lhs":
+        u = qmc.LatinHypercube(d, seed=seed).random(n_samples)
+    elif method == "random":
+        u = np.random.default_rng(seed).random((n_samples, d))
+    else:
+        raise ValueError(f"Unknown sampling method: {method}")
+    # Keep the inverse CDFs finite
+    u = np.clip(u, 1e-12, 1 - 1e-12)
+    return np.column_stack([_transform(u[:, j], dist) for j, dist in enumerate(distributions.values())])
+
+def batch_parameters(base, names, values):
+    """
+    One Parameters object holding a batch of parameter sets as arrays of shape (n_samples, 1),
+    which broadcast against a flat array of grid points in rate_coefficients.
+    Q_lh* follow the Em_*, D_* and Qa_* samples the way the parameter files derive them.
+    """
+    return base.derive(**{name: np.asarray(values[:, j], dtype=float)[:, None] for j, name in enumerate(names)})
+
+def _solve_samples(base, names, values, T, P, C_O, outputs):
+    # Every sample x grid point solved as one flat batch
+    params = batch_parameters(base, names, values)
+    coeffs = rate_coefficients(params, T, P, C_O)
+    shape = (values.shape[0], T.size)
+    coeffs = {k: (np.broadcast_to(v, shape).ravel() if np.ndim(v) else v) for k, v in coeffs.items()}
+    theta_O, theta_N, status = solve_coefficients(coeffs)
+    res_dict = {"theta_O": theta_O, "theta_N": theta_N}
+    res_dict.update(recombination_coefficients(reaction_rates(theta_O, theta_N, coeffs), coeffs))
+    return {name: res_dict[name].reshape(shape) for name in outputs}
+
+def _setup(base, names, T, P, C_O, outputs, edges):
+    return dict(base=base, names=names, T=T, P=P, C_O=C_O, outputs=outputs, edges=edges)
+
+def _reduce_chunk(values):
+    w = worker_state
+    solved = _solve_samples(w["base"], w["names"], values, w["T"], w["P"], w["C_O"], w["outputs"])
+    stats = {}
+    for name, samples in solved.items():
+        stats[name] = SampleStats((w["T"].size,), edges=w["edges"])
+        stats[name].append(samples)
+    return stats
+
+class UncertaintyResult:
+    """Statistics of every output over the samples, each array shaped like the grid (n_T, n_P, n_C)."""
+
+    def __init__(self, stats, coords, names, samples):
+        self.stats = stats
+        self.coords = dict(zip(("T", "P", "C_O"), coords))
+        self.shape = tuple(axis.size for axis in coords)
+        self.names = names
+        self.samples = samples
+
+    @property
+    def n_samples(self):
+        return self.samples.shape[0]
+
+    def mean(self, output):
+        return self.stats[output].mean.reshape(self.shape)
+
+    def std(self, output):
+        return self.stats[output].std.reshape(self.shape)
+
+    def quantile(self, output, q):
+        return self.stats[output].quantile(q).reshape(self.shape)
+
+    def band(self, output, lower=0.05, upper=0.95):
+        """(lower quantile, median, upper quantile) of an output."""
+        return self.quantile(output, lower), self.quantile(output, 0.5), self.quantile(output, upper)
+
+def propagate_uncertainty(param_file, distributions, temperatures, pressures, C_O=10/11, n_samples=1024,
+                          method="sobol", seed=None, outputs=UNCERTAINTY_OUTPUTS, chunk_size=None,
+                          max_workers=1, mp_context=None, edges=None):
+    """
+    Monte Carlo propagation of parameter uncertainty to gamma on temperatures x pressures x C_O.
+    Chunks of samples are solved as one batch each, over all grid points, and reduced right away
+    into running means and variances, plus log-histograms once there are more samples than histogram bins
+    (see streaming.SampleStats).
+    :param distributions: {name: (kind, a, b)}, see sample_parameters.
+    :param chunk_size: Samples per batch, by default about 2e5 sample x grid points per batch.
+    :param max_workers: Processes; with more than one the chunks are solved on a process pool.
+    :param edges: Histogram edges of log10(gamma) for the quantiles, default those of streaming.SampleStats.
+    :return: UncertaintyResult
+    """
+    base = param_file if isinstance(param_file, Parameters) else load_parameters(param_file)
+    C_O = resolve_composition(base, C_O)
+    axes = tuple(np.atleast_1d(np.asarray(v, dtype=float)) for v in (temperatures, pressures, C_O))
+    T, P, C = (v.ravel() for v in np.meshgrid(*axes, indexing="ij"))
+    names = tuple(distributions)
+    samples = sample_parameters(distributions, n_samples, method=method, seed=seed)
+    if chunk_size is None:
+        chunk_size = max(1, 200_000 // T.size)
+    chunks = [samples[start:start + chunk_size] for start in range(0, n_samples, chunk_size)]
+
+    stats = {name: SampleStats((T.size,), edges=edges) for name in outputs}
+    initargs = (base, names, T, P, C, tuple(outputs), edges)
+    if max_workers == 1:
+        init_worker(_setup, *initargs)
+        for chunk in chunks:
+            for name, part in _reduce_chunk(chunk).items():
+                stats[name].merge(part)
+    else:
+        max_workers = max_workers or os.cpu_count() or 1
+        with worker_pool(max_workers, mp_context, _setup, initargs) as executor:
+            futures = [executor.submit(_reduce_chunk, chunk) for chunk in chunks]
+            # Merged statistics do not depend on the chunk order, so chunks are folded in as they finish
+            for future in as_completed(futures):
+                for name, part in future.result().items():
+                    stats[name].merge(part)
+    return UncertaintyResult(stats, axes, names, samples)